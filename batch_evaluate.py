@@ -0,0 +1,118 @@
+# Scores whole batches of positions in a few NumPy calls, for analysis and data generation rather than
+# the search. A batch is an N x 12 array of uint64 bitboards indexed by piece code, the same bits as
+# Position.pieces; to_planes and from_planes convert to and from N x 12 x 64 piece planes. The score is
+# evaluate's material and piece-square terms plus mobility. Without NumPy, evaluate_positions falls back
+# to scoring one position at a time in pure Python.
+from evaluate import MOBILITY_WEIGHTS, PIECE_SCORES, evaluate, mobility
+from position import BISHOP, BLACK, COL_MASKS, KNIGHT, QUEEN, ROOK, WHITE
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# (shift, mask) per direction, a positive shift moving towards higher squares; the mask drops squares
+# that wrapped around to the other side of the board
+_ROOK_STEPS = [(1, ~COL_MASKS[0]), (-1, ~COL_MASKS[7]), (8, None), (-8, None)]
+_BISHOP_STEPS = [(9, ~COL_MASKS[0]), (7, ~COL_MASKS[7]), (-7, ~COL_MASKS[0]), (-9, ~COL_MASKS[7])]
+_KNIGHT_STEPS = [(17, ~COL_MASKS[0]), (15, ~COL_MASKS[7]), (10, ~(COL_MASKS[0] | COL_MASKS[1])),
+                 (6, ~(COL_MASKS[6] | COL_MASKS[7])), (-6, ~(COL_MASKS[0] | COL_MASKS[1])),
+                 (-10, ~(COL_MASKS[6] | COL_MASKS[7])), (-15, ~COL_MASKS[0]), (-17, ~COL_MASKS[7])]
+_tables = None
+
+
+def _build_tables():
+    # per piece code, byte k of its bitboard (row k) and that byte's value: the summed scores of the
+    # squares it holds, black counting against white; and the set bits of every byte value
+    scores = np.zeros((12, 8, 256), dtype=np.int32)
+    for piece in range(12):
+        sign = 1 if piece < 6 else -1
+        for row in range(8):
+            for value in range(256):
+                scores[piece, row, value] = sign * sum(PIECE_SCORES[piece][row * 8 + col]
+                                                       for col in range(8) if value >> col & 1)
+    popcounts = np.array([bin(value).count("1") for value in range(256)], dtype=np.int32)
+    return scores, popcounts
+
+
+def _bytes(boards):
+    # the bitboards' bytes, least significant first whatever the machine's byte order
+    return np.ascontiguousarray(boards, dtype="<u8").view(np.uint8).reshape(boards.shape + (8,))
+
+
+def _popcount(boards, popcounts):
+    if hasattr(np, "bitwise_count"):  # NumPy 2
+        return np.bitwise_count(boards).astype(np.int32)
+    return popcounts[_bytes(boards)].sum(axis=-1)
+
+
+def _step(boards, shift, mask):
+    moved = boards << np.uint64(shift) if shift > 0 else boards >> np.uint64(-shift)
+    return moved if mask is None else moved & np.uint64(mask & (1 << 64) - 1)
+
+
+def _sliding_moves(sliders, empty, not_own, steps, popcounts):
+    # along one direction the rays of several sliders never overlap, as each stops at the first piece
+    # in its way, so counting the union per direction counts every slider's squares separately
+    total = 0
+    for shift, mask in steps:
+        ray = _step(sliders, shift, mask)
+        attacks = ray
+        for _ in range(6):
+            ray = _step(ray & empty, shift, mask)
+            attacks = attacks | ray
+        total = total + _popcount(attacks & not_own, popcounts)
+    return total
+
+
+def boards(positions):
+    # N x 12 uint64 bitboards and the N sides to move for a sequence of Position
+    positions = list(positions)
+    return (np.array([position.pieces for position in positions], dtype=np.uint64).reshape(-1, 12),
+            np.array([position.turn for position in positions], dtype=np.int8))
+
+
+def to_planes(batch):
+    # N x 12 x 64 uint8 planes of the same bitboards
+    return np.unpackbits(_bytes(batch), axis=-1, bitorder="little")
+
+
+def from_planes(planes):
+    return np.packbits(np.asarray(planes, dtype=np.uint8), axis=-1, bitorder="little").view("<u8")[..., 0]
+
+
+def evaluate_boards(batch, turns):
+    # centipawn scores for N x 12 bitboards, each from the point of view of its side to move in turns
+    global _tables
+    if _tables is None:
+        _tables = _build_tables()
+    scores, popcounts = _tables
+    batch = np.asarray(batch, dtype=np.uint64)
+    total = scores[np.arange(12)[:, None], np.arange(8), _bytes(batch)].sum(axis=(1, 2))
+
+    sides = np.bitwise_or.reduce(batch[:, :6], axis=1), np.bitwise_or.reduce(batch[:, 6:], axis=1)
+    empty = ~(sides[WHITE] | sides[BLACK])
+    for color in (WHITE, BLACK):
+        not_own = ~sides[color]
+        code = color * 6
+        # knight jumps are one-to-one too, so the same per-direction counting works for them
+        knights = sum(_popcount(_step(batch[:, code + KNIGHT], shift, mask) & not_own, popcounts)
+                      for shift, mask in _KNIGHT_STEPS)
+        bishops = _sliding_moves(batch[:, code + BISHOP], empty, not_own, _BISHOP_STEPS, popcounts)
+        rooks = _sliding_moves(batch[:, code + ROOK], empty, not_own, _ROOK_STEPS, popcounts)
+        queens = _sliding_moves(batch[:, code + QUEEN], empty, not_own, _ROOK_STEPS + _BISHOP_STEPS, popcounts)
+        mobility_score = (MOBILITY_WEIGHTS[KNIGHT] * knights + MOBILITY_WEIGHTS[BISHOP] * bishops +
+                          MOBILITY_WEIGHTS[ROOK] * rooks + MOBILITY_WEIGHTS[QUEEN] * queens)
+        total += mobility_score if color == WHITE else -mobility_score
+    return np.where(np.asarray(turns) == WHITE, total, -total)
+
+
+def evaluate_positions(positions, batch_size=65536):
+    # the same scores for a sequence of Position, vectorized in batches when NumPy is installed
+    positions = list(positions)
+    if np is None:
+        return [evaluate(position) + mobility(position) for position in positions]
+    scores = []
+    for start in range(0, len(positions), batch_size):
+        scores.extend(evaluate_boards(*boards(positions[start:start + batch_size])).tolist())
+    return scores
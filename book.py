@@ -0,0 +1,101 @@
+# Opening book in the Polyglot format, probed straight from a memory-mapped file: 16-byte big-endian
+# records of (position key, move, weight, learn), sorted by key, found by binary search. Keys are Polyglot
+# keys (polyglot_key), so books from other programs work here and books built with build_book work there.
+import mmap
+import random
+import struct
+from collections import defaultdict
+
+from pgn import parse_san, read_games
+from polyglot import polyglot_key
+from position import KING, ROOK, STARTING_FEN, WHITE, Move, Position
+from storage import lower_bound, open_mapped
+
+ENTRY = struct.Struct(">QHHI")
+
+
+def encode_move(position, move):
+    # Polyglot counts ranks from rank 1 and writes castling as the king taking its own rook
+    from_sq, to_sq = move.from_sq, move.to_sq
+    if position.board[from_sq] % 6 == KING and abs(to_sq - from_sq) == 2:
+        to_sq = from_sq + 3 if to_sq > from_sq else from_sq - 4
+    # Polyglot's promotion codes 1-4 (knight to queen) are the same numbers as the piece types here
+    promotion = 0 if move.promotion is None else move.promotion
+    return (to_sq % 8) | (7 - to_sq // 8) << 3 | (from_sq % 8) << 6 | (7 - from_sq // 8) << 9 | promotion << 12
+
+
+def decode_move(position, value):
+    # the legal Move an encoded book move stands for, or None if it isn't legal here (a key collision)
+    to_sq = (7 - (value >> 3 & 7)) * 8 + (value & 7)
+    from_sq = (7 - (value >> 9 & 7)) * 8 + (value >> 6 & 7)
+    promotion = value >> 12 & 7 or None
+    piece = position.board[from_sq]
+    if piece is not None and piece % 6 == KING and position.board[to_sq] == piece - KING + ROOK:
+        to_sq = from_sq + 2 if to_sq > from_sq else from_sq - 2
+    move = Move(from_sq, to_sq, promotion)
+    return move if position.is_legal(move) else None
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        self._data = open_mapped(path)
+
+    def __len__(self):
+        return len(self._data) // ENTRY.size
+
+    def moves(self, position):
+        # [(Move, weight)] stored for the position, heaviest first
+        data = self._data
+        wanted = polyglot_key(position)
+        index = lower_bound(data, ENTRY, wanted)
+        found = []
+        while index < len(self):
+            key, value, weight, _ = ENTRY.unpack_from(data, index * ENTRY.size)
+            if key != wanted:
+                break
+            move = decode_move(position, value)
+            if move is not None:
+                found.append((move, weight))
+            index += 1
+        found.sort(key=lambda entry: -entry[1])
+        return found
+
+    def choose(self, position, rng=random):
+        # a book move picked with probability proportional to its weight, or None once out of book
+        moves = [(move, weight) for move, weight in self.moves(position) if weight]
+        if not moves:
+            return None
+        return rng.choices([move for move, _ in moves], [weight for _, weight in moves])[0]
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+
+def build_book(games, path, plies=20, min_games=1):
+    # writes a book from a PGN path or iterable of lines, covering each game's first plies; a move is
+    # weighted 2 per win and 1 per draw for the side playing it, as Polyglot does
+    counts = defaultdict(lambda: [0, 0])
+    for game in read_games(games):
+        if game.headers.get("FEN", STARTING_FEN) != STARTING_FEN:
+            continue
+        position = Position()
+        try:
+            for san in game.moves[:plies]:
+                move = parse_san(position, san)
+                white_score = {"1-0": 2, "0-1": 0}.get(game.result, 1)
+                entry = counts[(polyglot_key(position), encode_move(position, move))]
+                entry[0] += 1
+                entry[1] += white_score if position.turn == WHITE else 2 - white_score
+                position.push(move)
+        except ValueError:
+            continue  # keep the moves before the bad one
+
+    entries = sorted((key, move, weight) for (key, move), (played, weight) in counts.items() if played >= min_games)
+    # weights are 16-bit, so scale every entry down alike if the heaviest would overflow
+    scale = max([weight for _, _, weight in entries] + [0xFFFF]) / 0xFFFF
+    with open(path, "wb") as output:
+        for key, move, weight in entries:
+            output.write(ENTRY.pack(key, move, int(weight / scale), 0))
+    return len(entries)
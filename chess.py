@@ -1,508 +1,244 @@
-import tkinter as tk
-from tkinter import messagebox, simpledialog
-#from tktooltip import ToolTip
-
-import random
-import sys
-from PIL import Image, ImageTk
-
-tile_size = 50
-border_width = 20
-# Load images into a dictionary for easier access
-image_paths = {
-    "black_queen": "./Images/black_queen.png",
-    "black_king": "./Images/black_king.png",
-    "black_rook": "./Images/black_rook.png",
-    "black_bishop": "./Images/black_bishop.png",
-    "black_knight": "./Images/black_knight.png",
-    "black_pawn": "./Images/black_pawn.png",
-    "white_queen": "./Images/white_queen.png",
-    "white_king": "./Images/white_king.png",
-    "white_rook": "./Images/white_rook.png",
-    "white_bishop": "./Images/white_bishop.png",
-    "white_knight": "./Images/white_knight.png",
-    "white_pawn": "./Images/white_pawn.png"
-}
-
-class Promoter(tk.simpledialog.Dialog):
-    def __init__(self, parent, color):
-        self.color = color
-        self.promoted = "queen" # by default
-        super().__init__(parent, "Promote Pawn")
-
-    def body(self, frame):
-        # print(type(frame)) # tkinter.Frame
-        self.label = tk.Label(frame, text="Select a piece to promote the pawn to:")
-        self.label.pack()
-        return frame
-
-    def buttonbox(self):
-        self.queen = tk.Button(self,
-                               text="Queen",
-                               command=self.promote_to_queen
-                               # image = PhotoImage(file=image_paths.get(f"{self.color}_queen")),
-                               # image = PhotoImage(Image.open(image_paths.get(f"{self.color}_queen")).resize((tile_size, tile_size), Image.Resampling.BILINEAR)),
-                               # image = Image.open(image_paths.get(f"{self.color}_queen")).resize((tile_size, tile_size), Image.Resampling.BILINEAR),
-                               )
-        self.queen.pack()
-        self.rook = tk.Button(self,
-                              text="Rook",
-                              command=self.promote_to_rook
-                              # image = PhotoImage(Image.open(image_paths.get(f"{self.color}_rook")).resize((tile_size, tile_size), Image.Resampling.BILINEAR)),
-                              )
-        self.rook.pack()
-        self.rook.pack()
-        self.bishop = tk.Button(self,
-                                text="Bishop",
-                                command=self.promote_to_bishop
-                                # image = PhotoImage(Image.open(image_paths.get(f"{self.color}_bishop")).resize((tile_size, tile_size), Image.Resampling.BILINEAR)),
-                                )
-        self.bishop.pack()
-        self.knight = tk.Button(self,
-                                text="Knight",
-                                command=self.promote_to_knight
-                                # image = PhotoImage(Image.open(image_paths.get(f"{self.color}_knight")).resize((tile_size, tile_size), Image.Resampling.BILINEAR)),
-                                )
-        self.knight.pack()
-
-    def promote_to_queen(self):
-        self.promoted = "queen"
-        self.ok()
-    def promote_to_rook(self):
-        self.promoted = "rook"
-        self.ok()
-    def promote_to_bishop(self):
-        self.promoted = "bishop"
-        self.ok()
-    def promote_to_knight(self):
-        self.promoted = "knight"
-        self.ok()
-    # def cancel(self, event = None):
-    #     self.promoted = "queen"
-    #     super().cancel()
-
-
-class ChessGame:
-    def __init__(self, root, opponent_type):
-        self.root = root
-        self.black_player = opponent_type
-        self.images = {key: ImageTk.PhotoImage(Image.open(path).resize((tile_size, tile_size), Image.Resampling.BILINEAR))
-                  for key, path in image_paths.items()}
-        self.board = self.initialize_board()
-        self.current_player = "white"
-        self.selected_piece = None
-        self.valid_moves = []
-
-        self.white_king_moved = False
-        self.white_right_rook_moved = False
-        self.white_left_rook_moved = False
-
-        self.black_king_moved = False
-        self.black_right_rook_moved = False
-        self.black_left_rook_moved = False
-
-        self.allow_recursion = True
-        self.create_gui()
-
-    def initialize_board(self):
-        # Initialize an 8x8 chess board
-        board = [[None for _ in range(8)] for _ in range(8)]
-        pieces = ["rook", "knight", "bishop", "queen", "king", "bishop", "knight", "rook"]
-
-        # Place pawns
-        board[1] = ["black_pawn"] * 8
-        board[6] = ["white_pawn"] * 8
-
-        # Place other pieces
-        for i in range(8):
-            board[0][i] = f"black_{pieces[i]}"
-            board[7][i] = f"white_{pieces[i]}"
-
-        return board
-
-    def create_gui(self):
-        self.canvas = tk.Canvas(self.root, width=8 * tile_size + 2*border_width, height=8 * tile_size + 2*border_width)
-        self.canvas.pack()
-        self.draw_board()
-        self.canvas.bind("<Button-1>", self.on_click)
-
-    def draw_board(self):
-        self.canvas.delete("all")
-        for row in range(8):
-            for col in range(8):
-                color = "white" if (row + col) % 2 == 0 else "gray"
-                x1, y1 = col * tile_size + border_width, row * tile_size + border_width
-                x2, y2 = x1 + tile_size, y1 + tile_size
-                self.canvas.create_rectangle(x1, y1, x2, y2, fill=color)
-
-                piece = self.board[row][col]
-                if piece:
-                    piece_image = self.images.get(piece)
-                    if piece_image:
-                        self.canvas.create_image(
-                            x1 + tile_size // 2,
-                            y1 + tile_size // 2,
-                            image=piece_image)
-
-        if self.selected_piece is not None:
-            row, col = self.selected_piece
-            x1, y1 = col * tile_size+2 + border_width, row * tile_size+2 + border_width
-            x2, y2 = x1 + tile_size-3, y1 + tile_size-3
-            self.canvas.create_rectangle(x1, y1, x2, y2, outline="blue", width=2)
-            for move in self.valid_moves:
-                x1, y1 = move[1] * tile_size+2 + border_width, move[0] * tile_size+2 + border_width
-                x2, y2 = x1 + tile_size-3, y1 + tile_size-3
-                if self.board[move[0]][move[1]]:
-                    self.canvas.create_rectangle(x1, y1, x2, y2, outline="red", width=2)
-                else:
-                    self.canvas.create_rectangle(x1, y1, x2, y2, outline="green", width=2)
-        for i in range(8):
-            self.canvas.create_text(border_width + tile_size // 2 + i * tile_size, border_width // 2, text=chr(ord('A')+i))
-            self.canvas.create_text(border_width // 2, border_width + tile_size // 2 + i * tile_size, text=8-i)
-            self.canvas.create_text(border_width + tile_size // 2 + i * tile_size, tile_size * 8 + 3 * border_width // 2, text=chr(ord('A')+i))
-            self.canvas.create_text(tile_size * 8 + 3 * border_width // 2, border_width + tile_size // 2 + i * tile_size, text=8-i)
-
-    def on_click(self, event):
-        if self.current_player == "black" and self.black_player == "computer":
-            return
-
-        row, col = (event.y - border_width) // tile_size, (event.x - border_width) // tile_size
-        if row < 0 or row >= 8 or col < 0 or col >= 8:
-            return
-        print(f"{self.current_player} clicked on {row}, {col}: {self.board[row][col]}")
-
-        if self.selected_piece is None:  # First click
-            piece = self.board[row][col]
-            if not piece or \
-               ("white" in piece and self.current_player == "black") or \
-               ("black" in piece and self.current_player == "white"):
-                return
-            self.selected_piece = (row, col)
-            self.valid_moves = self.get_valid_moves(row, col)
-            self.draw_board()
-        else:  # Second click: do the move
-            from_row, from_col = self.selected_piece
-            if (row, col) not in self.valid_moves:
-                if self.board[row][col] and self.get_color(row, col) == self.current_player:
-                    self.selected_piece = (row, col)
-                    self.valid_moves = self.get_valid_moves(row, col)
-                    self.draw_board()
-                return
-            self.make_move(from_row, from_col, row, col)
-
-            if self.current_player == "black" and self.black_player == "computer":
-                self.root.after(1, self.computer_move)
-
-    def make_move(self, from_row, from_col, to_row, to_col):
-        if self.board[from_row][from_col] == "white_king":
-            self.white_king_moved = True
-            if to_col == 2 and from_col == 4:
-                self.board[7][3] = "white_rook"
-                self.board[7][0] = None
-            elif to_col == 6 and from_col == 4:
-                self.board[7][5] = "white_rook"
-                self.board[7][7] = None
-        elif self.board[from_row][from_col] == "white_rook":
-            if from_col == 0:
-                self.white_left_rook_moved = True
-            elif from_col == 7:
-                self.white_right_rook_moved = True
-        elif self.board[from_row][from_col] == "black_king":
-            self.black_king_moved = True
-            if to_col == 2 and from_col == 4:
-                self.board[0][3] = "black_rook"
-                self.board[0][0] = None
-            elif to_col == 6 and from_col == 4:
-                self.board[0][5] = "black_rook"
-                self.board[0][7] = None
-        elif self.board[from_row][from_col] == "black_rook":
-            if from_col == 0:
-                self.black_left_rook_moved = True
-            elif from_col == 7:
-                self.black_right_rook_moved = True
-        elif self.board[from_row][from_col] == "white_pawn" and to_row == 0:
-            self.pawn_promotion(from_row, from_col)
-        elif self.board[from_row][from_col] == "black_pawn" and to_row == 7:
-            self.pawn_promotion(from_row, from_col)
-
-        self.board[to_row][to_col] = self.board[from_row][from_col]
-        self.board[from_row][from_col] = None
-        self.current_player = "black" if self.current_player == "white" else "white"
-        self.selected_piece = None
-        self.draw_board()
-
-        if self.check_game_over():
-            self.root.quit()
-
-    def computer_move(self):
-        all_my_moves = self.get_all_moves(self.current_player)
-        for move in all_my_moves.copy():
-            if not self.is_safe_move(move[0], move[1], move[2], move[3]):
-                all_my_moves.remove(move)
-        move = random.choice(all_my_moves)
-        self.make_move(move[0], move[1], move[2], move[3])
-
-    def get_all_moves(self, color):
-        all_moves = []
-        if not self.allow_recursion:
-            return all_moves
-        self.allow_recursion = False
-        for row in range(8):
-            for col in range(8):
-                if self.get_color(row, col) == color:
-                    moves = self.get_valid_moves(row, col)
-                    for move in moves:
-                        all_moves.append((row, col, move[0], move[1]))
-        self.allow_recursion = True
-        return all_moves
-
-    def check_game_over(self):
-        all_my_moves = self.get_all_moves(self.current_player)
-        for move in all_my_moves.copy():
-            if not self.is_safe_move(move[0], move[1], move[2], move[3]):
-                all_my_moves.remove(move)
-        king_loc = self.get_king_location()
-
-        if all_my_moves != []:
-            all_opp_moves = self.get_all_moves("white" if self.current_player == "black" else "black")
-            for move in all_opp_moves:
-                if move[2] == king_loc[1] and move[3] == king_loc[0]:  # king is in check
-                    self.display_check_tooltip()
-                    return False
-            return False
-
-        all_opp_moves = self.get_all_moves("white" if self.current_player == "black" else "black")
-        for move in all_opp_moves:
-            if move[2] == king_loc[1] and move[3] == king_loc[0]: # king is in checkmate
-                winner = "White" if self.current_player == "black" else "Black"
-                messagebox.showinfo("Game Over", f"{winner} wins!")
-                return True
-        messagebox.showinfo("Game Over", "It's a draw!")
-        return True
-
-    def get_valid_moves(self, row, col):
-        moves = []
-        piece = self.board[row][col]
-        if "pawn" in piece:
-            moves = self.get_pawn_moves(row, col)
-        elif "rook" in piece:
-            moves = self.get_rook_moves(row, col)
-        elif "knight" in piece:
-            moves = self.get_knight_moves(row, col)
-        elif "bishop" in piece:
-            moves = self.get_bishop_moves(row, col)
-        elif "queen" in piece:
-            moves = self.get_queen_moves(row, col)
-        elif "king" in piece:
-            moves = self.get_king_moves(row, col)
-
-        # avoid moves that put the king in check
-        self.filter_check_moves(row, col, moves)
-        return moves
-
-    def get_pawn_moves(self, row, col):
-        moves = []
-        if "white" in self.board[row][col]:
-            if row > 0:
-                if not self.board[row-1][col]:
-                    moves.append((row-1, col))
-                    if row == 6 and not self.board[row-2][col]:
-                        moves.append((row-2, col))
-                if col > 0:
-                    if self.board[row-1][col-1] and self.get_color(row - 1, col - 1) == "black":
-                        moves.append((row-1, col-1))
-                if col < 7:
-                    if self.board[row-1][col+1] and self.get_color(row - 1, col + 1) == "black":
-                        moves.append((row-1, col+1))
-        else: #black piece
-            if row < 7:
-                if not self.board[row+1][col]:
-                    moves.append((row+1, col))
-                    if row == 1 and not self.board[row+2][col]:
-                        moves.append((row+2, col))
-                if col > 0:
-                    if self.board[row+1][col-1] and self.get_color(row+1, col-1) == "white":
-                        moves.append((row+1, col-1))
-                if col < 7:
-                    if self.board[row+1][col+1] and self.get_color(row+1, col+1) == "white":
-                        moves.append((row+1, col+1))
-        return moves
-
-    def get_rook_moves(self, row, col):
-        moves = []
-        for i in range(col+1, 8):
-            if not self.board[row][i]:
-                moves.append((row, i))
-            else:
-                if self.get_color(row, col) != self.get_color(row, i):
-                    moves.append((row, i))
-                break
-        for i in range(col-1, -1, -1):
-            if not self.board[row][i]:
-                moves.append((row, i))
-            else:
-                if self.get_color(row, col) != self.get_color(row, i):
-                    moves.append((row, i))
-                break
-        for i in range(row+1, 8):
-            if not self.board[i][col]:
-                moves.append((i, col))
-            else:
-                if self.get_color(row, col) != self.get_color(i, col):
-                    moves.append((i, col))
-                break
-        for i in range(row-1, -1, -1):
-            if not self.board[i][col]:
-                moves.append((i, col))
-            else:
-                if self.get_color(row, col) != self.get_color(i, col):
-                    moves.append((i, col))
-                break
-        return moves
-
-    def get_knight_moves(self, row, col):
-        moves = []
-        for i, j in [(2, 1), (2, -1), (-2, 1), (-2, -1),
-                     (1, 2), (1, -2), (-1, 2), (-1, -2)]:
-            if 0 <= row + i < 8 and 0 <= col + j < 8:
-                if not self.board[row+i][col+j] or self.get_color(row, col) != self.get_color(row+i, col+j):
-                    moves.append((row+i, col+j))
-        return moves
-
-    def get_bishop_moves(self, row, col):
-        moves = []
-        for i in range(1, min(row, col)+1):
-            if not self.board[row-i][col-i]:
-                moves.append((row-i, col-i))
-            else:
-                if self.get_color(row, col) != self.get_color(row-i, col-i):
-                    moves.append((row-i, col-i))
-                break
-        for i in range(1, min(row, 7-col)+1):
-            if not self.board[row-i][col+i]:
-                moves.append((row-i, col+i))
-            else:
-                if self.get_color(row, col) != self.get_color(row-i, col+i):
-                    moves.append((row-i, col+i))
-                break
-        for i in range(1, min(7-row, col)+1):
-            if not self.board[row+i][col-i]:
-                moves.append((row+i, col-i))
-            else:
-                if self.get_color(row, col) != self.get_color(row+i, col-i):
-                    moves.append((row+i, col-i))
-                break
-        for i in range(1, min(7-row, 7-col)+1):
-            if not self.board[row+i][col+i]:
-                moves.append((row+i, col+i))
-            else:
-                if self.get_color(row, col) != self.get_color(row+i, col+i):
-                    moves.append((row+i, col+i))
-                break
-        return moves
-
-    def get_queen_moves(self, row, col):
-        moves = []
-        moves.extend(self.get_rook_moves(row, col))
-        moves.extend(self.get_bishop_moves(row, col))
-        return moves
-
-    def get_king_moves(self, row, col):
-        moves = []
-        for i in range(-1, 2):
-            for j in range(-1, 2):
-                if 0 <= row + i < 8 and 0 <= col + j < 8:
-                    if not self.board[row+i][col+j] or self.get_color(row, col) != self.get_color(row+i, col+j):
-                        moves.append((row+i, col+j))
-
-        # Castling white
-        if self.get_color(row, col) == "white" and not self.white_king_moved:
-            if not self.white_right_rook_moved and not self.board[7][1] and not self.board[7][2] and not self.board[7][3] and \
-               self.board[7][0] == "white_rook":
-                moves.append((7, 2))
-            if not self.white_right_rook_moved and not self.board[7][5] and not self.board[7][6] and \
-               self.board[7][7] == "white_rook":
-                moves.append((7, 6))
-
-        # Castling black
-        if self.get_color(row, col) == "black" and not self.black_king_moved:
-            if not self.black_right_rook_moved and not self.board[0][1] and not self.board[0][2] and not self.board[0][3] and \
-               self.board[0][0] == "black_rook":
-                moves.append((0, 2))
-            if not self.black_right_rook_moved and not self.board[0][5] and not self.board[0][6] and \
-               self.board[0][7] == "black_rook":
-                moves.append((0, 6))
-        return moves
-
-    def filter_check_moves(self, row, col, moves):
-        moves_iter = moves.copy()  # avoid modifying the list while iterating
-        for move in moves_iter:
-            if not self.is_safe_move(row, col, move[0], move[1]):
-                moves.remove(move)
-
-
-    def is_safe_move(self, from_row, from_col, to_row, to_col):
-        piece = self.board[from_row][from_col]
-        old_piece = self.board[to_row][to_col]
-        self.board[to_row][to_col] = piece
-        self.board[from_row][from_col] = None
-
-        king_col, king_row = self.get_king_location()
-
-        opp_moves = self.get_all_moves("white" if self.current_player == "black" else "black")
-        for opp_move in opp_moves:
-            if opp_move[2] == king_row and opp_move[3] == king_col:
-                self.board[from_row][from_col] = piece
-                self.board[to_row][to_col] = old_piece
-                return False # not a safe move, king is in check
-
-        self.board[from_row][from_col] = piece
-        self.board[to_row][to_col] = old_piece
-        return True
-
-    def get_king_location(self):
-        king_row = -1
-        king_col = -1
-        for i in range(8):
-            for j in range(8):
-                if self.board[i][j] == f"{self.current_player}_king":
-                    king_row = i
-                    king_col = j
-                    break
-        return king_col, king_row
-
-    def get_color(self, row, col):
-        if not self.board[row][col]:
-            return None
-        return self.board[row][col].split('_')[0]
-
-    def pawn_promotion(self, row, col):
-        if self.current_player == "black" and self.black_player == "computer":
-            self.board[row][col] = f"black_{random.choice(['queen', 'rook', 'bishop', 'knight'])}"
-            return
-        promo_window = Promoter(self.root, "white" if self.current_player == "white" else "black")
-        self.board[row][col] = f"{self.current_player}_{promo_window.promoted}"
-
-    def display_check_tooltip(self):
-        x, y = self.root.winfo_pointerx(), self.root.winfo_pointery()
-        tooltip = tk.Toplevel(self.root)
-        tooltip.title("Check")
-        tooltip.overrideredirect(True)
-        tooltip.geometry(f"+{x + 20}+{y + 20}")
-        label = tk.Label(tooltip, text="King is in check!", bg="yellow", fg="red", padx=10, pady=5,
-                                  highlightbackground="black", borderwidth=1, relief="solid")
-        label.pack()
-        tooltip.after(2000, tooltip.destroy)
-
-
-if __name__ == "__main__":
-    if len(sys.argv) < 2 or sys.argv[1] not in ["computer", "opponent"]:
-        print("Usage: python chess.py <opponent_type>")
-        print("opponent_type: 'computer' or 'opponent'")
-        sys.exit(1)
-
-    opponent_type = sys.argv[1]
-    window = tk.Tk()
-    window.title("Chess Game")
-    game = ChessGame(window, opponent_type)
-    window.mainloop()
+import argparse
+import cProfile
+import json
+import logging
+import pstats
+import sys
+import time
+
+import stats
+from book import build_book
+from endgames import generate_tables
+from parallel import parallel_divide
+from perft import divide, perft, run_suite
+from pgn import read_games, replay
+from selfplay import MAX_PLIES, OPENING_PLIES, game_record, parse_player, run_match, summarize
+from position import STARTING_FEN, Position
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="chess.py")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="run under cProfile and write the stats to FILE, or print the top entries for - "
+                             "(worker processes aren't profiled)")
+    parser.add_argument("--stats", action="store_true",
+                        help="time the move generation, drawing and search hot paths and print a summary at the end")
+    parser.add_argument("--log-level", default="warning", choices=["debug", "info", "warning", "error"])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    opponent = commands.add_parser("opponent", help="play against another person")
+    computer = commands.add_parser("computer", help="play against the computer")
+    for game in (opponent, computer):
+        game.add_argument("--piece-set", choices=["pieces", "sheet"], default="pieces",
+                          help="draw pieces from one PNG each or cut them from the single sprite sheet")
+    computer.add_argument("--depth", type=int, help="let the computer search this many plies instead of moving at random")
+    computer.add_argument("--movetime", type=int, help="let the computer search for this many milliseconds per move")
+    computer.add_argument("--hash", type=int, default=16, help="transposition table size in MB, 0 to disable")
+    computer.add_argument("--workers", type=int, default=1,
+                          help="search each root move in its own process across this many workers")
+    computer.add_argument("--book", help="opening book file to play from before searching")
+    computer.add_argument("--endgames", help="directory of endgame tables to play perfectly from")
+
+    perft_parser = commands.add_parser("perft", help="count move generation leaf nodes")
+    perft_parser.add_argument("--depth", type=int, help="plies to count, or the maximum depth with --suite")
+    perft_parser.add_argument("--fen", default=STARTING_FEN, help="position to count from")
+    perft_parser.add_argument("--divide", action="store_true", help="print the count below each root move")
+    perft_parser.add_argument("--suite", action="store_true",
+                              help="run the standard perft positions and check them against known counts")
+    perft_parser.add_argument("--output", help="with --suite, also write the results to this file as JSON")
+    perft_parser.add_argument("--workers", type=int, default=1, help="count subtrees in this many processes")
+
+    selfplay = commands.add_parser("selfplay", help="play games between two computer players without a window")
+    selfplay.add_argument("--games", type=int, default=100)
+    selfplay.add_argument("--player1", default="depth:2", help="random, depth:N or movetime:MS")
+    selfplay.add_argument("--player2", default="random", help="random, depth:N or movetime:MS")
+    selfplay.add_argument("--workers", type=int, help="processes to spread games over, all cores by default")
+    selfplay.add_argument("--max-plies", type=int, default=MAX_PLIES, help="adjudicate longer games as draws")
+    selfplay.add_argument("--opening-plies", type=int, default=OPENING_PLIES,
+                          help="random plies each pair of games starts from, played once with each color")
+    selfplay.add_argument("--seed", type=int, default=0, help="seed for the openings and the random players")
+    selfplay.add_argument("--output", help="file to write every game to")
+    selfplay.add_argument("--format", choices=["pgn", "jsonl"],
+                          help="output format, guessed from the --output extension by default")
+
+    pgn_parser = commands.add_parser("pgn", help="replay every game of a PGN file through the rules")
+    pgn_parser.add_argument("file")
+    pgn_parser.add_argument("--quiet", action="store_true", help="only print the summary, not each invalid game")
+
+    book_parser = commands.add_parser("book", help="build an opening book from the games of a PGN file")
+    book_parser.add_argument("file")
+    book_parser.add_argument("--output", default="book.bin")
+    book_parser.add_argument("--plies", type=int, default=20, help="how far into each game to take moves")
+    book_parser.add_argument("--min-games", type=int, default=1, help="leave out moves played in fewer games")
+
+    endgames_parser = commands.add_parser("endgames", help="generate the KQK, KRK and KPK endgame tables")
+    endgames_parser.add_argument("--output", default="endgames", help="directory to write the tables to")
+
+    uci_parser = commands.add_parser("uci", help="speak the UCI protocol on stdin and stdout")
+    uci_parser.add_argument("--hash", type=int, default=16, help="transposition table size in MB, 0 to disable")
+    uci_parser.add_argument("--book", help="opening book file to play from before searching")
+    uci_parser.add_argument("--endgames", help="directory of endgame tables to play perfectly from")
+    return parser.parse_args(argv)
+
+
+def run_game(args):
+    # the GUI stack is only imported when a window is wanted, so headless commands need neither Tk nor PIL
+    import tkinter as tk
+    from book import OpeningBook
+    from endgames import EndgameTables
+    from engine import Engine
+    from gui import ChessGame, image_paths
+    from parallel import RootSplitEngine
+    from sprites import SpriteAtlas, sheet_path
+
+    engine = None
+    if args.command == "computer" and (args.depth or args.movetime):
+        book = OpeningBook(args.book) if args.book else None
+        endgames = EndgameTables(args.endgames) if args.endgames else None
+        if args.workers > 1:
+            engine = RootSplitEngine(depth=args.depth, movetime=args.movetime, hash_mb=args.hash, workers=args.workers,
+                                     book=book, endgames=endgames)
+        else:
+            engine = Engine(depth=args.depth, movetime=args.movetime, hash_mb=args.hash, book=book, endgames=endgames)
+
+    window = tk.Tk()
+    window.title("Chess Game")
+    sprites = SpriteAtlas(image_paths, sheet=sheet_path if args.piece_set == "sheet" else None)
+    game = ChessGame(window, args.command, engine, sprites)
+    window.mainloop()
+    if isinstance(engine, RootSplitEngine):
+        engine.close()
+
+
+def run_perft(args):
+    if args.suite:
+        results = run_suite(args.depth)
+        failed = 0
+        for result in results:
+            status = "ok" if result["passed"] else f"FAILED, expected {result['expected']}"
+            print(f"{result['name']:<10} depth {result['depth']}: {result['nodes']} nodes in {result['seconds']:.2f}s "
+                  f"({result['nps']:,.0f} nodes/s) {status}")
+            failed += not result["passed"]
+        if args.output:
+            with open(args.output, "w") as output:
+                json.dump(results, output, indent=2)
+        return 1 if failed else 0
+
+    if not args.depth:
+        print("perft needs --depth (or --suite)")
+        return 2
+    position = Position(args.fen)
+    start = time.perf_counter()
+    if args.divide or args.workers > 1:
+        counts = parallel_divide(position, args.depth, args.workers) if args.workers > 1 else divide(position, args.depth)
+        if args.divide:
+            for move, count in counts.items():
+                print(f"{move}: {count}")
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(position, args.depth)
+    elapsed = time.perf_counter() - start
+    print(f"perft {args.depth}: {nodes} nodes in {elapsed:.2f}s ({nodes / elapsed if elapsed else 0:,.0f} nodes/s)")
+    return 0
+
+
+def run_pgn(args):
+    games = invalid = plies = 0
+    start = time.perf_counter()
+    for game in read_games(args.file):
+        games += 1
+        try:
+            replay(game)
+        except ValueError as error:
+            invalid += 1
+            if not args.quiet:
+                print(f"game {games} ({game.headers.get('White', '?')} - {game.headers.get('Black', '?')}): {error}")
+            continue
+        plies += len(game.moves)
+    elapsed = time.perf_counter() - start
+    print(f"{games} games, {invalid} invalid, {plies} plies in {elapsed:.2f}s "
+          f"({games / elapsed if elapsed else 0:,.1f} games/s, {plies / elapsed if elapsed else 0:,.0f} plies/s)")
+    return 1 if invalid else 0
+
+
+def run_book(args):
+    start = time.perf_counter()
+    entries = build_book(args.file, args.output, args.plies, args.min_games)
+    print(f"{entries} book entries written to {args.output} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def run_endgames(args):
+    start = time.perf_counter()
+    for name, records in generate_tables(args.output):
+        print(f"{name}: {records} won or lost positions after {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def run_selfplay(args):
+    try:
+        player1, player2 = parse_player(args.player1), parse_player(args.player2)
+    except ValueError as error:
+        print(error)
+        return 2
+    output_format = args.format or ("pgn" if args.output and args.output.endswith(".pgn") else "jsonl")
+    output = open(args.output, "w") if args.output else None
+
+    games = []
+    start = time.perf_counter()
+    matches = run_match(player1, player2, args.games, args.workers, args.seed, args.max_plies, args.opening_plies)
+    for i, game in enumerate(matches):
+        games.append({"result": game["result"], "plies": game["plies"], "player1_white": i % 2 == 0})
+        if output:
+            output.write(game_record(game, output_format))
+    elapsed = time.perf_counter() - start
+    if output:
+        output.close()
+
+    summary = summarize(games)
+    plies = sum(game["plies"] for game in games)
+    print(f"{len(games)} games in {elapsed:.1f}s ({len(games) / elapsed if elapsed else 0:.2f} games/s, "
+          f"{plies / len(games) if games else 0:.1f} plies per game)")
+    print(f"{args.player1} vs {args.player2}: +{summary['wins']} ={summary['draws']} -{summary['losses']}, "
+          f"score {summary['score']:.3f} +/- {summary['margin']:.3f}, "
+          f"Elo {summary['elo']:+.0f} [{summary['elo_low']:+.0f}, {summary['elo_high']:+.0f}]")
+    return 0
+
+
+def run_uci(args):
+    from book import OpeningBook
+    from endgames import EndgameTables
+    from engine import Engine
+    from uci import UciServer
+
+    engine = Engine(hash_mb=args.hash, book=OpeningBook(args.book) if args.book else None,
+                    endgames=EndgameTables(args.endgames) if args.endgames else None)
+    UciServer(engine).run()
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s %(name)s: %(message)s")
+    if args.stats:
+        stats.enable()
+    commands = {"perft": run_perft, "pgn": run_pgn, "selfplay": run_selfplay, "book": run_book,
+                "endgames": run_endgames, "uci": run_uci}
+    run = commands.get(args.command, run_game)
+
+    if args.profile is None:
+        status = run(args)
+    else:
+        profiler = cProfile.Profile()
+        status = profiler.runcall(run, args)
+        if args.profile == "-":
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(30)
+        else:
+            profiler.dump_stats(args.profile)
+    if args.stats:
+        print(stats.format_report(), file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
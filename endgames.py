@@ -0,0 +1,228 @@
+# Endgame tables for king and queen, rook or pawn against a bare king. They are generated by retrograde
+# analysis and probed through mmap like the opening book. A table file holds (position key, plies to mate)
+# records for every won or lost position, sorted by key. Odd distances are wins for the side to move and
+# even ones losses. Positions with the table's material that aren't in the file are draws.
+import os
+import struct
+from array import array
+
+from position import (BLACK, KING, KING_ATTACKS, PAWN, PAWN_ATTACKS, QUEEN, ROOK, WHITE, ZOBRIST_BLACK_TO_MOVE,
+                      ZOBRIST_CASTLING, ZOBRIST_PIECES, queen_attacks, rook_attacks)
+from storage import lower_bound, open_mapped
+
+RECORD = struct.Struct(">QH")
+# in generation order, as pawn promotions look their result up in the queen and rook tables
+TABLES = {"KQK": QUEEN, "KRK": ROOK, "KPK": PAWN}
+
+_UNKNOWN, _DRAW, _ILLEGAL = 0xFFFF, 0xFFFE, 0xFFFD
+
+
+def _index(turn, strong_king, weak_king, piece_sq):
+    # generation runs with white as the strong side; the black-strong half of a table is its mirror image
+    return turn << 18 | strong_king << 12 | weak_king << 6 | piece_sq
+
+
+def _piece_attacks(piece_type, sq, occupied):
+    if piece_type == PAWN:
+        return PAWN_ATTACKS[WHITE][sq]
+    if piece_type == ROOK:
+        return rook_attacks(sq, occupied)
+    return queen_attacks(sq, occupied)
+
+
+def _white_moves(piece_type, index, promotions):
+    # (successor index, value) for each white move; a promotion's value comes from the table it promotes into
+    strong_king, weak_king, piece_sq = index >> 12 & 63, index >> 6 & 63, index & 63
+    blocked = 1 << strong_king | 1 << weak_king | 1 << piece_sq
+    for to_sq in bits(KING_ATTACKS[strong_king] & ~KING_ATTACKS[weak_king] & ~blocked):
+        yield _index(BLACK, to_sq, weak_king, piece_sq), None
+    if piece_type != PAWN:
+        for to_sq in bits(_piece_attacks(piece_type, piece_sq, blocked) & ~blocked):
+            yield _index(BLACK, strong_king, weak_king, to_sq), None
+        return
+    to_sq = piece_sq - 8
+    if blocked >> to_sq & 1:
+        return
+    if to_sq < 8:
+        for table in promotions:
+            yield None, table[_index(BLACK, strong_king, weak_king, to_sq)]
+        return
+    yield _index(BLACK, strong_king, weak_king, to_sq), None
+    if piece_sq >= 48 and not blocked >> (to_sq - 8) & 1:
+        yield _index(BLACK, strong_king, weak_king, to_sq - 8), None
+
+
+def _black_moves(piece_type, index):
+    # successor index for each black king move, None for capturing the piece
+    strong_king, weak_king, piece_sq = index >> 12 & 63, index >> 6 & 63, index & 63
+    # the weak king can't hide behind itself from a slider, so it leaves the occupancy
+    guarded = KING_ATTACKS[strong_king] | _piece_attacks(piece_type, piece_sq, 1 << strong_king | 1 << piece_sq)
+    for to_sq in bits(KING_ATTACKS[weak_king] & ~guarded & ~(1 << strong_king)):
+        yield None if to_sq == piece_sq else _index(WHITE, strong_king, to_sq, piece_sq)
+
+
+def bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _white_unmoves(piece_type, index):
+    # white-to-move positions that reach the black-to-move position index in one white move
+    strong_king, weak_king, piece_sq = index >> 12 & 63, index >> 6 & 63, index & 63
+    blocked = 1 << strong_king | 1 << weak_king | 1 << piece_sq
+    for from_sq in bits(KING_ATTACKS[strong_king] & ~blocked):
+        yield _index(WHITE, from_sq, weak_king, piece_sq)
+    if piece_type != PAWN:
+        for from_sq in bits(_piece_attacks(piece_type, piece_sq, blocked) & ~blocked):
+            yield _index(WHITE, strong_king, weak_king, from_sq)
+    elif piece_sq < 48 and not blocked >> (piece_sq + 8) & 1:
+        yield _index(WHITE, strong_king, weak_king, piece_sq + 8)
+        if 32 <= piece_sq < 40 and not blocked >> (piece_sq + 16) & 1:
+            yield _index(WHITE, strong_king, weak_king, piece_sq + 16)
+
+
+def _black_unmoves(index):
+    # black-to-move positions that reach the white-to-move position index in one black king move
+    strong_king, weak_king, piece_sq = index >> 12 & 63, index >> 6 & 63, index & 63
+    for from_sq in bits(KING_ATTACKS[weak_king] & ~(1 << strong_king | 1 << piece_sq)):
+        yield _index(BLACK, strong_king, from_sq, piece_sq)
+
+
+def generate(piece_type, promotions=()):
+    # plies to mate for every position of the table, indexed by _index; promotions are the generated
+    # queen and rook tables, which a pawn table needs
+    values = array("H", [_ILLEGAL]) * (2 << 18)
+    solved = []
+    promoted = {}
+    for index in range(2 << 18):
+        turn, strong_king, weak_king, piece_sq = index >> 18, index >> 12 & 63, index >> 6 & 63, index & 63
+        if len({strong_king, weak_king, piece_sq}) < 3 or KING_ATTACKS[strong_king] >> weak_king & 1:
+            continue
+        if piece_type == PAWN and not 8 <= piece_sq < 56:
+            continue
+        check = _piece_attacks(piece_type, piece_sq, 1 << strong_king | 1 << weak_king) >> weak_king & 1
+        if turn == WHITE and check:
+            continue
+        values[index] = _UNKNOWN
+        if turn == BLACK and not any(True for _ in _black_moves(piece_type, index)):
+            values[index] = 0 if check else _DRAW
+            if check:
+                solved.append(index)
+        elif turn == WHITE and piece_type == PAWN and piece_sq < 16:
+            # a promotion wins one ply after the promoted side gets mated in the queen or rook table
+            losses = [value for successor, value in _white_moves(piece_type, index, promotions)
+                      if successor is None and value < _ILLEGAL and value % 2 == 0]
+            if losses:
+                promoted.setdefault(min(losses) + 1, []).append(index)
+
+    # retrograde: every position is solved at its exact distance, white moving on odd plies and black
+    # on even ones, by looking back from the positions solved the ply before
+    plies = 0
+    while solved or any(ply > plies for ply in promoted):
+        plies += 1
+        found = set(promoted.pop(plies, []))
+        if plies % 2:
+            for index in solved:
+                found.update(_white_unmoves(piece_type, index))
+        else:
+            for index in solved:
+                for candidate in _black_unmoves(index):
+                    # lost only once every king move, capturing the piece included, runs into a win for white
+                    if values[candidate] == _UNKNOWN and candidate not in found and \
+                       all(successor is not None and values[successor] < plies and values[successor] % 2
+                           for successor in _black_moves(piece_type, candidate)):
+                        found.add(candidate)
+        solved = [index for index in found if values[index] == _UNKNOWN]
+        for index in solved:
+            values[index] = plies
+    for index, value in enumerate(values):
+        if value == _UNKNOWN:
+            values[index] = _DRAW
+    return values
+
+
+def _key(turn, strong, strong_king, weak_king, piece_type, piece_sq):
+    weak = 1 - strong
+    key = ZOBRIST_CASTLING[0] ^ ZOBRIST_PIECES[strong * 6 + KING][strong_king] ^ \
+        ZOBRIST_PIECES[weak * 6 + KING][weak_king] ^ ZOBRIST_PIECES[strong * 6 + piece_type][piece_sq]
+    return key ^ ZOBRIST_BLACK_TO_MOVE if turn == BLACK else key
+
+
+def write_table(values, piece_type, path):
+    records = []
+    for index, value in enumerate(values):
+        if value >= _ILLEGAL:
+            continue
+        turn, strong_king, weak_king, piece_sq = index >> 18, index >> 12 & 63, index >> 6 & 63, index & 63
+        records.append((_key(turn, WHITE, strong_king, weak_king, piece_type, piece_sq), value))
+        # the same position with colors swapped and the board flipped top to bottom
+        records.append((_key(1 - turn, BLACK, strong_king ^ 56, weak_king ^ 56, piece_type, piece_sq ^ 56), value))
+    records.sort()
+    with open(path, "wb") as output:
+        for key, value in records:
+            output.write(RECORD.pack(key, value))
+    return len(records)
+
+
+def generate_tables(directory):
+    # writes every table into directory; yields (name, records) as each one is done
+    os.makedirs(directory, exist_ok=True)
+    generated = {}
+    for name, piece_type in TABLES.items():
+        promotions = [generated[QUEEN], generated[ROOK]] if piece_type == PAWN else ()
+        generated[piece_type] = generate(piece_type, promotions)
+        yield name, write_table(generated[piece_type], piece_type, os.path.join(directory, name + ".bin"))
+
+
+class EndgameTables:
+    def __init__(self, directory):
+        # whichever of the tables exist in directory, each mapped rather than read
+        self.directory = directory
+        self.tables = {}
+        for name, piece_type in TABLES.items():
+            path = os.path.join(directory, name + ".bin")
+            if os.path.exists(path):
+                self.tables[piece_type] = open_mapped(path)
+
+    def probe(self, position):
+        # (result, plies) for the side to move, result being 1, 0 or -1 for win, draw or loss and plies the
+        # distance to mate; None if no table covers the position
+        occupied = position.occupied[WHITE] | position.occupied[BLACK]
+        if occupied.bit_count() != 3:
+            return None
+        pieces = position.pieces
+        piece_sq = (occupied & ~(pieces[KING] | pieces[6 + KING])).bit_length() - 1
+        data = self.tables.get(position.board[piece_sq] % 6)
+        if data is None:
+            return None
+        # tables are keyed without castling rights, which a king and rook can still hold on their home squares
+        wanted = position.key ^ ZOBRIST_CASTLING[position.castling] ^ ZOBRIST_CASTLING[0]
+        index = lower_bound(data, RECORD, wanted)
+        if index * RECORD.size < len(data):
+            key, plies = RECORD.unpack_from(data, index * RECORD.size)
+            if key == wanted:
+                return (1 if plies % 2 else -1), plies
+        return 0, 0
+
+    def best_move(self, position):
+        # the move keeping the best result: the fastest win, a draw, or else the slowest loss;
+        # None if no table covers the position
+        if self.probe(position) is None:
+            return None
+        best, best_rank = None, None
+        for move in position.legal_moves():
+            position.push(move)
+            # captures and underpromotions leave material no table covers, which is a draw here
+            result, plies = self.probe(position) or (0, 0)
+            position.pop()
+            rank = (-result, plies if result > 0 else -plies)
+            if best_rank is None or rank > best_rank:
+                best, best_rank = move, rank
+        return best
+
+    def close(self):
+        for data in self.tables.values():
+            if not isinstance(data, bytes):
+                data.close()
@@ -0,0 +1,288 @@
+# Computer player: negamax alpha-beta with iterative deepening, quiescence search and a time budget.
+import time
+
+import stats
+from evaluate import PIECE_VALUES, evaluate
+from position import PAWN
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+MATE_SCORE = 100000
+INFINITE = MATE_SCORE + 1
+MAX_DEPTH = 64
+# scores beyond this are forced mates, found by the search or further away by an endgame table
+MATE_BOUND = MATE_SCORE - 1000
+TIME_CHECK_INTERVAL = 32  # nodes between clock reads, a couple of milliseconds
+DEADLINE_MARGIN = 0.005  # seconds kept back for unwinding the search and returning its move
+DELTA_MARGIN = 200  # what positional gains a capture can bring besides the piece itself
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Engine:
+    def __init__(self, depth=None, movetime=None, hash_mb=16, book=None, endgames=None):
+        self.depth = depth or MAX_DEPTH
+        self.movetime = movetime  # milliseconds, None for no limit
+        # an OpeningBook and EndgameTables answer the positions they know without searching
+        self.book = book
+        self.endgames = endgames
+        # kept across searches so later moves reuse what earlier ones found
+        self.tt = TranspositionTable(hash_mb) if hash_mb else None
+        self.nodes = 0
+        self.best_score = 0
+        self.depth_reached = 0
+        self.killers = [[None, None] for _ in range(MAX_DEPTH + 1)]
+        self.history = [[0] * 64 for _ in range(12)]
+        self._deadline = None
+        self._stop_requested = False
+        self._root_result = None  # (score, move) of the best root move the current depth has finished
+
+    def search(self, position, depth=None, movetime=None, on_iteration=None, alpha=-INFINITE, beta=INFINITE):
+        # returns the best move found, so a move is always ready when the deadline hits: the best of the
+        # last completed depth, or of the root moves a cut-short depth finished, since those start with
+        # the previous best. on_iteration is called with (depth, score, best move, seconds) after each
+        # completed depth. A stop() holds until clear_stop(), which callers run before starting a search.
+        # With a narrower window than the default, best_score is only a bound once it falls outside it
+        depth = depth or self.depth
+        movetime = movetime if movetime is not None else self.movetime
+        start = time.perf_counter()
+        self._deadline = None if movetime is None else start + max(movetime / 1000 - DEADLINE_MARGIN, movetime / 2000)
+        self.nodes = 0
+        self.best_score = 0
+        self.depth_reached = 0
+        self.killers = [[None, None] for _ in range(MAX_DEPTH + 1)]
+        self.history = [[0] * 64 for _ in range(12)]
+        if self.tt is not None:
+            self.tt.new_search()
+
+        if self.book is not None:
+            move = self.book.choose(position)
+            if move is not None:
+                return move
+        if self.endgames is not None:
+            move = self.endgames.best_move(position)
+            if move is not None:
+                return move
+        root_moves = position.legal_moves()
+        if not root_moves:
+            return None
+        # the first depth has no previous best to go on, so it starts from the usual move ordering
+        entry = self.tt.probe(position.key) if self.tt is not None else None
+        root_moves = self._order(position, root_moves, 0, entry[3] if entry is not None else None)
+        best_move = root_moves[0]
+        stack_size = len(position.move_stack)
+
+        for iteration in range(1, depth + 1):
+            self._root_result = None
+            try:
+                score, move = self._search_root(position, root_moves, best_move, iteration, alpha, beta)
+            except SearchTimeout:
+                while len(position.move_stack) > stack_size:
+                    position.pop()
+                if self._root_result is not None:
+                    best_move, self.best_score = self._root_result[1], self._root_result[0]
+                break
+            best_move, self.best_score, self.depth_reached = move, score, iteration
+            if on_iteration is not None:
+                on_iteration(iteration, score, move, time.perf_counter() - start)
+            if self._stop_requested or abs(score) >= MATE_SCORE - MAX_DEPTH:
+                break
+            # an iteration costs several times the previous one, so don't start one that can't finish
+            if self._deadline is not None and time.perf_counter() - start > (self._deadline - start) / 2:
+                break
+        if stats.enabled:
+            stats.count("search nodes", self.nodes)
+        return best_move
+
+    def _search_root(self, position, root_moves, best_move, depth, alpha, beta):
+        root_moves.sort(key=lambda move: move != best_move)
+        best_score = -INFINITE
+        best = root_moves[0]
+        for move in root_moves:
+            position.push(move)
+            score = -self._search(position, depth - 1, -beta, -max(alpha, best_score), 1)
+            position.pop()
+            if score > best_score:
+                best_score, best = score, move
+                self._root_result = best_score, best
+                if score >= beta:
+                    break
+        return best_score, best
+
+    def principal_variation(self, position, first_move, length=MAX_DEPTH):
+        # the expected line after first_move, following best moves stored in the transposition table
+        line = [first_move]
+        position.push(first_move)
+        while self.tt is not None and len(line) < length and position.repetitions[position.key] == 1:
+            entry = self.tt.probe(position.key)
+            if entry is None or entry[3] is None or not position.is_legal(entry[3]):
+                break
+            line.append(entry[3])
+            position.push(entry[3])
+        for _ in line:
+            position.pop()
+        return line
+
+    def stop(self):
+        # safe to call from another thread; search returns its best move so far shortly after
+        self._stop_requested = True
+
+    def clear_stop(self):
+        self._stop_requested = False
+
+    def _tick(self):
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0 and \
+           (self._stop_requested or (self._deadline is not None and time.perf_counter() >= self._deadline)):
+            raise SearchTimeout()
+
+    def _search(self, position, depth, alpha, beta, ply):
+        if depth <= 0:
+            return self._quiesce(position, alpha, beta, ply)
+        self._tick()
+        # a single repetition already scores as a draw, the side that could avoid it would have
+        if position.repetitions[position.key] > 1 or position.is_insufficient_material():
+            return 0
+        if self.endgames is not None:
+            entry = self.endgames.probe(position)
+            if entry is not None:
+                result, plies = entry
+                return result * (MATE_SCORE - ply - plies)
+
+        tt_move = None
+        if self.tt is not None:
+            entry = self.tt.probe(position.key)
+            if entry is not None:
+                entry_depth, score, bound, tt_move = entry
+                if entry_depth >= depth:
+                    score = _score_from_tt(score, ply)
+                    if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                        return score
+
+        moves = position.legal_moves()
+        if not moves:
+            return -MATE_SCORE + ply if position.is_check() else 0
+        if position.halfmove_clock >= 100:
+            return 0
+
+        original_alpha = alpha
+        best = -INFINITE
+        best_move = None
+        for move in self._order(position, moves, ply, tt_move):
+            position.push(move)
+            score = -self._search(position, depth - 1, -beta, -alpha, ply + 1)
+            position.pop()
+            if score > best:
+                best, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if position.board[move.to_sq] is None and move.promotion is None:
+                            self._store_cutoff(position, move, depth, ply)
+                        break
+
+        if self.tt is not None:
+            bound = UPPER if best <= original_alpha else LOWER if best >= beta else EXACT
+            self.tt.store(position.key, depth, _score_to_tt(best, ply), bound, best_move)
+        return best
+
+    def _quiesce(self, position, alpha, beta, ply):
+        self._tick()
+        in_check = position.is_check()
+        if not in_check:
+            # stand pat: the side to move can usually do at least as well as doing nothing
+            stand_pat = evaluate(position)
+            if stand_pat >= beta or ply >= MAX_DEPTH:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+
+        moves = position.legal_moves()
+        if not moves:
+            return -MATE_SCORE + ply if in_check else 0
+        if not in_check:
+            board = position.board
+            enemy = 1 - position.turn
+            captures = []
+            for move in moves:
+                victim = board[move.to_sq]
+                if victim is None and move.promotion is None:
+                    if board[move.from_sq] % 6 == PAWN and move.to_sq == position.ep_square:
+                        captures.append(move)
+                    continue
+                gain = PIECE_VALUES[victim % 6] if victim is not None else 0
+                if move.promotion is not None:
+                    gain += PIECE_VALUES[move.promotion] - PIECE_VALUES[PAWN]
+                # delta pruning: even winning the piece outright leaves the score short of alpha
+                if stand_pat + gain + DELTA_MARGIN <= alpha:
+                    continue
+                # taking a cheaper piece on a defended square loses material, as far as a quick look can tell
+                if PIECE_VALUES[board[move.from_sq] % 6] > gain and position.is_attacked(move.to_sq, enemy):
+                    continue
+                captures.append(move)
+            moves = captures
+
+        best = alpha if not in_check else -INFINITE
+        for move in self._order(position, moves, ply):
+            position.push(move)
+            score = -self._quiesce(position, -beta, -alpha, ply + 1)
+            position.pop()
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+    def _order(self, position, moves, ply, tt_move=None):
+        # the transposition table's move first, then captures by MVV-LVA, killer moves and quiet moves
+        # by history score
+        board = position.board
+        killers = self.killers[min(ply, MAX_DEPTH)]
+        history = self.history
+
+        def score(move):
+            if move == tt_move:
+                return 2000000
+            piece = board[move.from_sq]
+            victim = board[move.to_sq]
+            if victim is not None or move.promotion is not None:
+                gain = PIECE_VALUES[victim % 6] if victim is not None else 0
+                if move.promotion is not None:
+                    gain += PIECE_VALUES[move.promotion]
+                return 1000000 + gain * 10 - piece % 6
+            if move == killers[0]:
+                return 900000
+            if move == killers[1]:
+                return 800000
+            return history[piece][move.to_sq]
+
+        return sorted(moves, key=score, reverse=True)
+
+    def _store_cutoff(self, position, move, depth, ply):
+        killers = self.killers[min(ply, MAX_DEPTH)]
+        if killers[0] != move:
+            killers[0], killers[1] = move, killers[0]
+        piece = position.board[move.from_sq]
+        self.history[piece][move.to_sq] = min(self.history[piece][move.to_sq] + depth * depth, 700000)
+
+
+# mate scores are stored relative to the node rather than the root, so a hit at another ply stays correct
+def _score_to_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+stats.watch(Engine, "search")
@@ -0,0 +1,98 @@
+# Static evaluation in centipawns from the side to move's point of view.
+from position import BISHOP, BLACK, KING, KNIGHT, KNIGHT_ATTACKS, QUEEN, ROOK, WHITE, bishop_attacks, queen_attacks, \
+    rook_attacks
+
+PIECE_VALUES = [100, 320, 330, 500, 900, 0]
+# centipawns per square a piece attacks that isn't taken by its own side; pawns and kings don't count
+MOBILITY_WEIGHTS = [0, 4, 5, 2, 1, 0]
+
+# piece-square tables for white, listed row 0 (8th rank) first so they index straight by square;
+# black looks them up mirrored with sq ^ 56
+PIECE_SQUARE_TABLES = [
+    [0, 0, 0, 0, 0, 0, 0, 0,
+     50, 50, 50, 50, 50, 50, 50, 50,
+     10, 10, 20, 30, 30, 20, 10, 10,
+     5, 5, 10, 25, 25, 10, 5, 5,
+     0, 0, 0, 20, 20, 0, 0, 0,
+     5, -5, -10, 0, 0, -10, -5, 5,
+     5, 10, 10, -20, -20, 10, 10, 5,
+     0, 0, 0, 0, 0, 0, 0, 0],
+    [-50, -40, -30, -30, -30, -30, -40, -50,
+     -40, -20, 0, 0, 0, 0, -20, -40,
+     -30, 0, 10, 15, 15, 10, 0, -30,
+     -30, 5, 15, 20, 20, 15, 5, -30,
+     -30, 0, 15, 20, 20, 15, 0, -30,
+     -30, 5, 10, 15, 15, 10, 5, -30,
+     -40, -20, 0, 5, 5, 0, -20, -40,
+     -50, -40, -30, -30, -30, -30, -40, -50],
+    [-20, -10, -10, -10, -10, -10, -10, -20,
+     -10, 0, 0, 0, 0, 0, 0, -10,
+     -10, 0, 5, 10, 10, 5, 0, -10,
+     -10, 5, 5, 10, 10, 5, 5, -10,
+     -10, 0, 10, 10, 10, 10, 0, -10,
+     -10, 10, 10, 10, 10, 10, 10, -10,
+     -10, 5, 0, 0, 0, 0, 5, -10,
+     -20, -10, -10, -10, -10, -10, -10, -20],
+    [0, 0, 0, 0, 0, 0, 0, 0,
+     5, 10, 10, 10, 10, 10, 10, 5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     0, 0, 0, 5, 5, 0, 0, 0],
+    [-20, -10, -10, -5, -5, -10, -10, -20,
+     -10, 0, 0, 0, 0, 0, 0, -10,
+     -10, 0, 5, 5, 5, 5, 0, -10,
+     -5, 0, 5, 5, 5, 5, 0, -5,
+     0, 0, 5, 5, 5, 5, 0, -5,
+     -10, 5, 5, 5, 5, 5, 0, -10,
+     -10, 0, 5, 0, 0, 0, 0, -10,
+     -20, -10, -10, -5, -5, -10, -10, -20],
+    [-30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -20, -30, -30, -40, -40, -30, -30, -20,
+     -10, -20, -20, -20, -20, -20, -20, -10,
+     20, 20, 0, 0, 0, 0, 20, 20,
+     20, 30, 10, 0, 0, 10, 30, 20],
+]
+
+# material and placement folded into one table per piece code and square
+PIECE_SCORES = [[PIECE_VALUES[piece_type] + PIECE_SQUARE_TABLES[piece_type][sq if color == WHITE else sq ^ 56]
+                 for sq in range(64)]
+                for color in (WHITE, BLACK) for piece_type in range(KING + 1)]
+
+
+def evaluate(position):
+    score = 0
+    for piece, bb in enumerate(position.pieces):
+        scores = PIECE_SCORES[piece]
+        total = 0
+        while bb:
+            total += scores[(bb & -bb).bit_length() - 1]
+            bb &= bb - 1
+        score += total if piece < 6 else -total
+    return score if position.turn == WHITE else -score
+
+
+def mobility(position):
+    # left out of evaluate, as the search gains less from it than it costs per node; batch scoring
+    # in batch_evaluate adds it on top
+    occupied = position.occupied[WHITE] | position.occupied[BLACK]
+    score = 0
+    for color in (WHITE, BLACK):
+        free = ~position.occupied[color]
+        total = 0
+        for piece_type, attacks in ((KNIGHT, None), (BISHOP, bishop_attacks), (ROOK, rook_attacks),
+                                    (QUEEN, queen_attacks)):
+            bb = position.pieces[color * 6 + piece_type]
+            count = 0
+            while bb:
+                sq = (bb & -bb).bit_length() - 1
+                count += ((KNIGHT_ATTACKS[sq] if attacks is None else attacks(sq, occupied)) & free).bit_count()
+                bb &= bb - 1
+            total += count * MOBILITY_WEIGHTS[piece_type]
+        score += total if color == WHITE else -total
+    return score if position.turn == WHITE else -score
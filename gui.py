@@ -0,0 +1,314 @@
+import tkinter as tk
+from tkinter import messagebox, simpledialog
+#from tktooltip import ToolTip
+
+import logging
+import queue
+import random
+import threading
+import time
+
+import stats
+from position import COLOR_NAMES, PIECE_NAMES, PIECE_TYPE_NAMES, Position, square
+from sprites import SpriteAtlas
+
+tile_size = 50
+border_width = 20
+poll_interval = 16  # ms between checks for the computer's move, about one frame
+logger = logging.getLogger(__name__)
+# Load images into a dictionary for easier access
+image_paths = {
+    "black_queen": "./Images/black_queen.png",
+    "black_king": "./Images/black_king.png",
+    "black_rook": "./Images/black_rook.png",
+    "black_bishop": "./Images/black_bishop.png",
+    "black_knight": "./Images/black_knight.png",
+    "black_pawn": "./Images/black_pawn.png",
+    "white_queen": "./Images/white_queen.png",
+    "white_king": "./Images/white_king.png",
+    "white_rook": "./Images/white_rook.png",
+    "white_bishop": "./Images/white_bishop.png",
+    "white_knight": "./Images/white_knight.png",
+    "white_pawn": "./Images/white_pawn.png"
+}
+
+class Promoter(tk.simpledialog.Dialog):
+    def __init__(self, parent, color):
+        self.color = color
+        self.promoted = "queen" # by default
+        super().__init__(parent, "Promote Pawn")
+
+    def body(self, frame):
+        # print(type(frame)) # tkinter.Frame
+        self.label = tk.Label(frame, text="Select a piece to promote the pawn to:")
+        self.label.pack()
+        return frame
+
+    def buttonbox(self):
+        self.queen = tk.Button(self,
+                               text="Queen",
+                               command=self.promote_to_queen
+                               # image = PhotoImage(file=image_paths.get(f"{self.color}_queen")),
+                               # image = PhotoImage(Image.open(image_paths.get(f"{self.color}_queen")).resize((tile_size, tile_size), Image.Resampling.BILINEAR)),
+                               # image = Image.open(image_paths.get(f"{self.color}_queen")).resize((tile_size, tile_size), Image.Resampling.BILINEAR),
+                               )
+        self.queen.pack()
+        self.rook = tk.Button(self,
+                              text="Rook",
+                              command=self.promote_to_rook
+                              # image = PhotoImage(Image.open(image_paths.get(f"{self.color}_rook")).resize((tile_size, tile_size), Image.Resampling.BILINEAR)),
+                              )
+        self.rook.pack()
+        self.rook.pack()
+        self.bishop = tk.Button(self,
+                                text="Bishop",
+                                command=self.promote_to_bishop
+                                # image = PhotoImage(Image.open(image_paths.get(f"{self.color}_bishop")).resize((tile_size, tile_size), Image.Resampling.BILINEAR)),
+                                )
+        self.bishop.pack()
+        self.knight = tk.Button(self,
+                                text="Knight",
+                                command=self.promote_to_knight
+                                # image = PhotoImage(Image.open(image_paths.get(f"{self.color}_knight")).resize((tile_size, tile_size), Image.Resampling.BILINEAR)),
+                                )
+        self.knight.pack()
+
+    def promote_to_queen(self):
+        self.promoted = "queen"
+        self.ok()
+    def promote_to_rook(self):
+        self.promoted = "rook"
+        self.ok()
+    def promote_to_bishop(self):
+        self.promoted = "bishop"
+        self.ok()
+    def promote_to_knight(self):
+        self.promoted = "knight"
+        self.ok()
+    # def cancel(self, event = None):
+    #     self.promoted = "queen"
+    #     super().cancel()
+
+
+class ChessGame:
+    def __init__(self, root, opponent_type, engine=None, sprites=None):
+        self.root = root
+        self.black_player = opponent_type
+        self.engine = engine  # None keeps the computer picking random moves
+        self.sprites = sprites or SpriteAtlas(image_paths)
+        self.position = Position()
+        self.selected_piece = None
+        self.valid_moves = []
+        # the engine searches on a worker thread and hands its move back through this queue
+        self.search_thread = None
+        self.search_results = queue.Queue()
+        self.search_started = None
+        self.create_gui()
+
+    @property
+    def current_player(self):
+        return COLOR_NAMES[self.position.turn]
+
+    def create_gui(self):
+        self.canvas = tk.Canvas(self.root, width=8 * tile_size + 2*border_width, height=8 * tile_size + 2*border_width)
+        self.canvas.pack()
+        self.status = tk.Label(self.root, text="")
+        self.status.pack()
+        self.create_board()
+        self.draw_board()
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+    def create_board(self):
+        # every canvas item is created once here; draw_board only reconfigures the squares that changed
+        self.piece_items = []
+        self.highlight_items = []
+        for row in range(8):
+            for col in range(8):
+                color = "white" if (row + col) % 2 == 0 else "gray"
+                x1, y1 = col * tile_size + border_width, row * tile_size + border_width
+                x2, y2 = x1 + tile_size, y1 + tile_size
+                self.canvas.create_rectangle(x1, y1, x2, y2, fill=color, tags="square")
+                self.piece_items.append(self.canvas.create_image(x1 + tile_size // 2, y1 + tile_size // 2, tags="piece"))
+                self.highlight_items.append(self.canvas.create_rectangle(x1 + 2, y1 + 2, x2 - 1, y2 - 1, width=2,
+                                                                         state="hidden", tags="highlight"))
+        self.canvas.tag_raise("piece")
+        self.canvas.tag_raise("highlight")
+        for i in range(8):
+            self.canvas.create_text(border_width + tile_size // 2 + i * tile_size, border_width // 2, text=chr(ord('A')+i))
+            self.canvas.create_text(border_width // 2, border_width + tile_size // 2 + i * tile_size, text=8-i)
+            self.canvas.create_text(border_width + tile_size // 2 + i * tile_size, tile_size * 8 + 3 * border_width // 2, text=chr(ord('A')+i))
+            self.canvas.create_text(tile_size * 8 + 3 * border_width // 2, border_width + tile_size // 2 + i * tile_size, text=8-i)
+        self.drawn_pieces = [None] * 64
+        self.drawn_highlights = [None] * 64
+
+    def draw_board(self):
+        highlights = [None] * 64
+        if self.selected_piece is not None:
+            highlights[square(*self.selected_piece)] = "blue"
+            for move in self.valid_moves:
+                highlights[square(*move)] = "red" if self.get_piece(move[0], move[1]) else "green"
+
+        for sq in range(64):
+            piece = self.get_piece(*divmod(sq, 8))
+            if piece != self.drawn_pieces[sq]:
+                self.canvas.itemconfig(self.piece_items[sq], image=self.sprites.get(piece, tile_size))
+                self.drawn_pieces[sq] = piece
+            if highlights[sq] != self.drawn_highlights[sq]:
+                if highlights[sq] is None:
+                    self.canvas.itemconfig(self.highlight_items[sq], state="hidden")
+                else:
+                    self.canvas.itemconfig(self.highlight_items[sq], outline=highlights[sq], state="normal")
+                self.drawn_highlights[sq] = highlights[sq]
+
+    def on_click(self, event):
+        if self.search_thread is not None or (self.current_player == "black" and self.black_player == "computer"):
+            return
+
+        row, col = (event.y - border_width) // tile_size, (event.x - border_width) // tile_size
+        if row < 0 or row >= 8 or col < 0 or col >= 8:
+            return
+        logger.debug("%s clicked on %d, %d: %s", self.current_player, row, col, self.get_piece(row, col))
+
+        if self.selected_piece is None:  # First click
+            if self.get_color(row, col) != self.current_player:
+                return
+            self.selected_piece = (row, col)
+            self.valid_moves = self.get_valid_moves(row, col)
+            self.draw_board()
+        else:  # Second click: do the move
+            from_row, from_col = self.selected_piece
+            if (row, col) not in self.valid_moves:
+                if self.get_color(row, col) == self.current_player:
+                    self.selected_piece = (row, col)
+                    self.valid_moves = self.get_valid_moves(row, col)
+                    self.draw_board()
+                return
+            self.make_move(from_row, from_col, row, col)
+
+            if self.current_player == "black" and self.black_player == "computer":
+                self.root.after(1, self.computer_move)
+
+    def make_move(self, from_row, from_col, to_row, to_col):
+        from_sq, to_sq = square(from_row, from_col), square(to_row, to_col)
+        moves = [move for move in self.position.legal_moves() if move.from_sq == from_sq and move.to_sq == to_sq]
+        move = moves[0]
+        if move.promotion is not None:
+            promotion = self.pawn_promotion()
+            move = next(move for move in moves if move.promotion == promotion)
+        self.play(move)
+
+    def play(self, move):
+        self.position.push(move)
+        self.selected_piece = None
+        self.draw_board()
+
+        if self.check_game_over():
+            self.root.quit()
+
+    def computer_move(self):
+        if self.engine is None:
+            # promotions are separate moves, so the computer also picks its promotion piece at random
+            self.play(random.choice(self.position.legal_moves()))
+            return
+        # search a copy so drawing never sees the engine's moves half-played
+        position = self.position.copy()
+        self.engine.clear_stop()
+        self.search_thread = threading.Thread(target=self.search, args=(position,), daemon=True)
+        self.status.config(text="Thinking\u2026")
+        self.search_started = time.perf_counter()
+        self.search_thread.start()
+        self.root.after(poll_interval, self.poll_computer_move)
+
+    def search(self, position):
+        # runs on the search thread; a failed search is handed back too, so the board never waits on it forever
+        try:
+            result = self.engine.search(position)
+        except Exception as error:
+            result = error
+        self.search_results.put((threading.current_thread(), result))
+
+    def poll_computer_move(self):
+        # results from a cancelled search's thread can still turn up, and are dropped
+        while True:
+            try:
+                thread, result = self.search_results.get_nowait()
+            except queue.Empty:
+                if self.search_thread is not None:
+                    self.root.after(poll_interval, self.poll_computer_move)
+                return
+            if thread is self.search_thread:
+                break
+        self.search_thread = None
+        if isinstance(result, Exception):
+            logger.error("engine search failed", exc_info=result)
+            self.status.config(text=f"The computer couldn't move: {result}")
+            return
+        self.status.config(text="")
+        if stats.enabled:
+            # as the player sees it, from starting the search to the move showing up
+            stats.record("computer move", time.perf_counter() - self.search_started)
+        if result is not None:
+            self.play(result)
+
+    def cancel_computer_move(self):
+        # the engine stops at its next clock check and the thread finishes on its own
+        if self.search_thread is not None:
+            self.engine.stop()
+            self.search_thread = None
+            self.status.config(text="")
+
+    def close(self):
+        self.cancel_computer_move()
+        if hasattr(self.engine, "close"):
+            self.engine.close()
+        self.root.destroy()
+
+    def check_game_over(self):
+        # there is no way to claim a draw here, so threefold repetition and fifty moves end the game right away
+        outcome = self.position.outcome(claim_draw=True)
+        if outcome is not None:
+            result, termination = outcome
+            if result == "1/2-1/2":
+                messagebox.showinfo("Game Over", f"It's a draw by {termination}!")
+            else:
+                messagebox.showinfo("Game Over", f"{'White' if result == '1-0' else 'Black'} wins!")
+            return True
+        if self.position.is_check():
+            self.display_check_tooltip()
+        return False
+
+    def get_valid_moves(self, row, col):
+        from_sq = square(row, col)
+        moves = []
+        for move in self.position.legal_moves():
+            if move.from_sq == from_sq and divmod(move.to_sq, 8) not in moves:
+                moves.append(divmod(move.to_sq, 8))
+        return moves
+
+    def get_piece(self, row, col):
+        piece = self.position.piece_at(square(row, col))
+        return None if piece is None else PIECE_NAMES[piece]
+
+    def get_color(self, row, col):
+        color = self.position.color_at(square(row, col))
+        return None if color is None else COLOR_NAMES[color]
+
+    def pawn_promotion(self):
+        promo_window = Promoter(self.root, self.current_player)
+        return PIECE_TYPE_NAMES.index(promo_window.promoted)
+
+    def display_check_tooltip(self):
+        x, y = self.root.winfo_pointerx(), self.root.winfo_pointery()
+        tooltip = tk.Toplevel(self.root)
+        tooltip.title("Check")
+        tooltip.overrideredirect(True)
+        tooltip.geometry(f"+{x + 20}+{y + 20}")
+        label = tk.Label(tooltip, text="King is in check!", bg="yellow", fg="red", padx=10, pady=5,
+                                  highlightbackground="black", borderwidth=1, relief="solid")
+        label.pack()
+        tooltip.after(2000, tooltip.destroy)
+
+
+stats.watch(ChessGame, "draw_board")
+stats.watch(ChessGame, "get_valid_moves")
@@ -0,0 +1,114 @@
+# Compact binary forms of moves and positions, for handing work to other processes and for position
+# datasets on disk. A move packs into 16 bits: from square, to square << 6, promotion piece type << 12
+# (0 for none), so move lists fit an array('H'). A position packs into a fixed-size record of a
+# nibble per square plus its flags and clocks. Records are read straight out of any buffer, a
+# memory-mapped file included, without copying it.
+import struct
+from array import array
+
+from position import Move, Position
+from storage import open_mapped
+
+# board nibbles (square 2i low, 2i + 1 high; 0 empty, else piece code + 1), turn | castling << 1,
+# en passant square (255 for none), halfmove clock, fullmove number
+RECORD = struct.Struct("<32sBBHH")
+NO_SQUARE = 255
+WRITE_CHUNK = 4096  # records packed into one buffer before it goes to the file
+
+# the pair of squares each board byte stands for, with None for codes that aren't pieces
+_DECODE = [(low - 1 if 0 < low <= 12 else None, high - 1 if 0 < high <= 12 else None)
+           for high in range(16) for low in range(16)]
+_VALID = [low <= 12 and high <= 12 for high in range(16) for low in range(16)]
+
+
+def pack_move(move):
+    return 0 if move is None else move.from_sq | move.to_sq << 6 | (move.promotion or 0) << 12
+
+
+def unpack_move(packed):
+    # 0 can't be a real move (a1 to a1), so it stands for no move
+    if not packed:
+        return None
+    return Move(packed & 63, packed >> 6 & 63, packed >> 12 or None)
+
+
+def pack_moves(moves):
+    return array("H", map(pack_move, moves))
+
+
+def unpack_moves(packed):
+    # packed is an array('H') or any buffer of native 16-bit values, e.g. the bytes of one
+    if not isinstance(packed, array):
+        packed = memoryview(packed).cast("B").cast("H")
+    return [unpack_move(value) for value in packed]
+
+
+def pack_position(position, buffer=None, offset=0):
+    # the record as bytes, or written into buffer at offset when one is given
+    codes = [0 if piece is None else piece + 1 for piece in position.board]
+    fields = (bytes(codes[sq] | codes[sq + 1] << 4 for sq in range(0, 64, 2)),
+              position.turn | position.castling << 1,
+              NO_SQUARE if position.ep_square is None else position.ep_square,
+              min(position.halfmove_clock, 0xFFFF), min(position.fullmove_number, 0xFFFF))
+    if buffer is None:
+        return RECORD.pack(*fields)
+    RECORD.pack_into(buffer, offset, *fields)
+
+
+def unpack_position(buffer, offset=0):
+    # a new Position from the record at offset in buffer; raises ValueError for a corrupt record
+    nibbles, flags, ep_square, halfmove_clock, fullmove_number = RECORD.unpack_from(buffer, offset)
+    if not all(_VALID[byte] for byte in nibbles) or flags >= 32 or (ep_square >= 64 and ep_square != NO_SQUARE):
+        raise ValueError(f"corrupt position record at offset {offset}")
+    position = Position.__new__(Position)
+    position.set_board([piece for byte in nibbles for piece in _DECODE[byte]], flags & 1, flags >> 1,
+                       None if ep_square == NO_SQUARE else ep_square, halfmove_clock, fullmove_number)
+    return position
+
+
+def root_and_moves(position):
+    # the position the game started from, packed, and the moves played since: everything needed to
+    # rebuild position with its repetition history in another process
+    root = position.copy()
+    while root.move_stack:
+        root.pop()
+    return pack_position(root), pack_moves(position.move_stack)
+
+
+def replay(record, moves):
+    position = unpack_position(record)
+    for move in unpack_moves(moves):
+        position.push(move)
+    return position
+
+
+def write_positions(path, positions):
+    # writes every Position as one record after another; returns how many there were
+    buffer = bytearray(RECORD.size * WRITE_CHUNK)
+    view = memoryview(buffer)
+    written = 0
+    with open(path, "wb") as output:
+        filled = 0
+        for position in positions:
+            pack_position(position, buffer, filled * RECORD.size)
+            filled += 1
+            if filled == WRITE_CHUNK:
+                output.write(view)
+                written += filled
+                filled = 0
+        output.write(view[:filled * RECORD.size])
+        written += filled
+    return written
+
+
+def read_positions(path, start=0, stop=None):
+    # yields the Position of each record from index start up to stop, reading the mapped file in place
+    data = open_mapped(path)
+    count = len(data) // RECORD.size
+    for index in range(start, count if stop is None else min(stop, count)):
+        yield unpack_position(data, index * RECORD.size)
+
+
+def count_positions(path):
+    with open(path, "rb") as file:
+        return file.seek(0, 2) // RECORD.size
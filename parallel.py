@@ -0,0 +1,225 @@
+# Root-split perft and search across a process pool. Positions and moves go to the workers in their
+# packed binary forms, a few dozen bytes per task.
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError
+
+import stats
+from endgames import EndgameTables
+from engine import INFINITE, MATE_SCORE, MAX_DEPTH, Engine
+from packed import pack_moves, replay, root_and_moves
+from perft import perft
+from position import move_to_uci
+
+RESULT_GRACE = 0.05  # seconds a worker's result may take to arrive after the deadline
+_worker_engine = None
+_closing = None  # set in every worker once its pool is closed
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def _perft_task(record, moves, depth):
+    return perft(replay(record, moves), depth)
+
+
+def _split(position, depth, min_tasks):
+    # move sequences to hand out as tasks; a few root moves can't keep many cores busy, so keep
+    # expanding one ply deeper until there are enough tasks or too little depth is left
+    paths = [[move] for move in position.legal_moves()]
+    plies = 1
+    while len(paths) < min_tasks and depth - plies > 2:
+        deeper = []
+        for path in paths:
+            for move in path:
+                position.push(move)
+            deeper.extend(path + [move] for move in position.legal_moves())
+            for _ in path:
+                position.pop()
+        paths = deeper
+        plies += 1
+    return paths, plies
+
+
+def parallel_divide(position, depth, workers=None):
+    # same result as perft.divide, with the subtrees counted in parallel
+    workers = workers or default_workers()
+    if depth < 2:
+        return {move_to_uci(move): 1 for move in position.legal_moves()}
+    paths, plies = _split(position, depth, workers * 8)
+    counts = {move_to_uci(move): 0 for move in position.legal_moves()}
+    record, history = root_and_moves(position)
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [(path[0], pool.submit(_perft_task, record, history + pack_moves(path), depth - plies))
+                   for path in paths]
+        for move, future in futures:
+            counts[move_to_uci(move)] += future.result()
+    return counts
+
+
+def parallel_perft(position, depth, workers=None):
+    return sum(parallel_divide(position, depth, workers).values())
+
+
+def _init_search_worker(closing):
+    global _closing
+    _closing = closing
+    threading.Thread(target=_stop_when_closing, daemon=True).start()
+
+
+def _stop_when_closing():
+    # a search still running when the pool closes would hold up the interpreter's exit until it finished
+    _closing.wait()
+    if _worker_engine is not None:
+        _worker_engine.stop()
+
+
+def _search_task(record, moves, depth, alpha, beta, deadline, hash_mb, endgames_dir):
+    # (score, nodes) for the root move ending moves, searched to depth within (alpha, beta) from the root's
+    # side, or None if the search couldn't finish in time. One engine per worker process, so its
+    # transposition table carries over between tasks and moves; endgame tables are mapped by path in
+    # each worker, sharing the same pages of the file
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = Engine(hash_mb=hash_mb, endgames=EndgameTables(endgames_dir) if endgames_dir else None)
+    movetime = None
+    if deadline is not None:
+        movetime = int((deadline - time.time()) * 1000)
+        if movetime <= 0:
+            return None
+    if _closing.is_set():
+        return None
+    # the game's moves are replayed too, so the worker sees repetitions of earlier positions
+    position = replay(record, moves)
+    # the engine would answer a position its tables cover without searching, leaving no score behind
+    if _worker_engine.endgames is not None:
+        entry = _worker_engine.endgames.probe(position)
+        if entry is not None:
+            result, plies = entry
+            return -result * (MATE_SCORE - 1 - plies), 1
+    reply = _worker_engine.search(position, depth=depth - 1, movetime=movetime, alpha=-beta, beta=-alpha)
+    if reply is None:
+        return (MATE_SCORE - 1 if position.is_check() else 0), 1
+    score = _worker_engine.best_score
+    # a search that finds a mate stops before its full depth, with nothing left to find
+    if _worker_engine.depth_reached < depth - 1 and abs(score) < MATE_SCORE - MAX_DEPTH:
+        return None
+    return -score, _worker_engine.nodes
+
+
+class RootSplitEngine:
+    # drop-in for Engine.search that spreads the root moves of each depth over worker processes. The
+    # first move, the previous depth's best, is searched in full; the others only need to show whether
+    # they beat it, which a null window around its score settles far more cheaply, and the few that do
+    # are searched again in full
+    def __init__(self, depth=None, movetime=None, hash_mb=16, workers=None, book=None, endgames=None):
+        self.depth = depth
+        self.movetime = movetime
+        self.hash_mb = hash_mb
+        self.workers = workers or default_workers()
+        self.book = book
+        self.endgames = endgames
+        self.nodes = 0
+        self.best_score = 0
+        self.depth_reached = 0
+        self._pool = None
+        self._closing = multiprocessing.Event()
+        self._futures = []
+        self._stop_requested = False
+        # the first depth is too small to be worth handing out, and gives the second its move ordering
+        self._first_depth = Engine(depth=1, hash_mb=0)
+
+    def search(self, position, depth=None, movetime=None):
+        depth = depth or self.depth or MAX_DEPTH
+        movetime = movetime if movetime is not None else self.movetime
+        moves = position.legal_moves()
+        if not moves:
+            return None
+        if self.book is not None:
+            move = self.book.choose(position)
+            if move is not None:
+                return move
+        if self.endgames is not None:
+            move = self.endgames.best_move(position)
+            if move is not None:
+                return move
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_init_search_worker,
+                                             initargs=(self._closing,))
+        start = time.time()
+        deadline = None if movetime is None else start + movetime / 1000
+        endgames_dir = self.endgames.directory if self.endgames is not None else None
+        record, history = root_and_moves(position)
+        self._futures = []
+
+        def submit(move, iteration, alpha, beta):
+            future = self._pool.submit(_search_task, record, history + pack_moves([move]), iteration, alpha, beta,
+                                       deadline, self.hash_mb, endgames_dir)
+            self._futures.append(future)
+            if self._stop_requested:
+                future.cancel()
+            return future
+
+        best_move = self._first_depth.search(position)
+        self.best_score, self.nodes, self.depth_reached = self._first_depth.best_score, self._first_depth.nodes, 1
+        for iteration in range(2, depth + 1):
+            if self._stop_requested or abs(self.best_score) >= MATE_SCORE - MAX_DEPTH:
+                break
+            # an iteration costs several times the previous one, so don't start one that can't finish
+            if deadline is not None and time.time() - start > (deadline - start) / 2:
+                break
+            moves.sort(key=lambda move: move != best_move)
+            score = self._result(submit(moves[0], iteration, -INFINITE, INFINITE), deadline)
+            if score is None:
+                break
+            best_move, self.best_score = moves[0], score
+            tests = [(move, submit(move, iteration, score, score + 1)) for move in moves[1:]]
+            complete = True
+            for move, future in tests:
+                score = self._result(future, deadline)
+                if score is not None and score > self.best_score:
+                    score = self._result(submit(move, iteration, self.best_score, INFINITE), deadline)
+                    if score is not None and score > self.best_score:
+                        best_move, self.best_score = move, score
+                complete = complete and score is not None
+            # a cut-short depth still counts for the moves it finished, which started with the previous best
+            if not complete:
+                break
+            self.depth_reached = iteration
+        if stats.enabled:
+            stats.count("search nodes", self.nodes)
+        return best_move
+
+    def _result(self, future, deadline):
+        # the task's score, or None once it has been cancelled or the deadline has passed without it
+        try:
+            result = future.result(None if deadline is None else max(0, deadline + RESULT_GRACE - time.time()))
+        except (CancelledError, TimeoutError):
+            future.cancel()
+            return None
+        if result is None:
+            return None
+        score, nodes = result
+        self.nodes += nodes
+        return score
+
+    def stop(self):
+        # root moves not yet handed to a worker are dropped; running ones finish their own search
+        self._stop_requested = True
+        for future in self._futures:
+            future.cancel()
+
+    def clear_stop(self):
+        self._stop_requested = False
+
+    def close(self):
+        if self._pool is not None:
+            self._closing.set()
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+stats.watch(RootSplitEngine, "search")
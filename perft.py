@@ -0,0 +1,65 @@
+# Move generation node counts, used both as a correctness gate and a throughput benchmark.
+import time
+
+from position import Position, move_to_uci
+
+# standard perft positions with their known node counts per depth, and the depth the suite runs by default
+SUITE = [
+    ("initial", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     [20, 400, 8902, 197281, 4865609, 119060324], 4),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603, 193690690], 3),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624, 11030083], 4),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333, 15833292], 3),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487, 89941194], 3),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594, 164075551], 3),
+]
+
+
+def perft(position, depth):
+    if depth == 0:
+        return 1
+    moves = position.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        position.push(move)
+        nodes += perft(position, depth - 1)
+        position.pop()
+    return nodes
+
+
+def divide(position, depth):
+    # leaf counts per root move, for tracking a wrong total down to the move that causes it
+    counts = {}
+    for move in position.legal_moves():
+        position.push(move)
+        counts[move_to_uci(move)] = perft(position, depth - 1)
+        position.pop()
+    return counts
+
+
+def run_suite(depth=None):
+    # one result dict per position; depth caps every position's default depth when given
+    results = []
+    for name, fen, expected, default_depth in SUITE:
+        run_depth = min(depth, default_depth) if depth else default_depth
+        start = time.perf_counter()
+        nodes = perft(Position(fen), run_depth)
+        elapsed = time.perf_counter() - start
+        results.append({
+            "name": name,
+            "fen": fen,
+            "depth": run_depth,
+            "nodes": nodes,
+            "expected": expected[run_depth - 1],
+            "passed": nodes == expected[run_depth - 1],
+            "seconds": elapsed,
+            "nps": nodes / elapsed if elapsed else 0.0,
+        })
+    return results
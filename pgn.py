@@ -0,0 +1,202 @@
+# SAN move notation and PGN games, including a reader that streams games one at a time from files of any size.
+import re
+from collections import namedtuple
+
+from position import FEN_PIECES, KING, PAWN, STARTING_FEN, WHITE, Position, parse_square, square_name
+
+PgnGame = namedtuple("PgnGame", ["headers", "moves", "result"])  # moves are SAN strings as written in the file
+
+RESULTS = {"1-0", "0-1", "1/2-1/2", "*"}
+SEVEN_TAG_ROSTER = ["Event", "Site", "Date", "Round", "White", "Black", "Result"]
+
+_SAN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQnbrq]))?$")
+_HEADER = re.compile(r'^\[\s*(\w+)\s+"(.*)"\s*\]\s*$')
+# comments, variations and NAGs are skipped; what is left are move numbers, moves and the result
+_TOKEN = re.compile(r"\{[^}]*\}?|;[^\n]*|\(|\)|\$\d+|[^\s(){};]+")
+_MOVE_NUMBER = re.compile(r"^\d+\.+$|^\.+$")
+_NESTING = re.compile(r"[{}();]")
+
+
+def move_to_san(position, move):
+    board = position.board
+    piece_type = board[move.from_sq] % 6
+    if piece_type == KING and abs(move.to_sq - move.from_sq) == 2:
+        san = "O-O" if move.to_sq > move.from_sq else "O-O-O"
+    else:
+        capture = board[move.to_sq] is not None or (piece_type == PAWN and move.to_sq == position.ep_square)
+        if piece_type == PAWN:
+            san = square_name(move.from_sq)[0] + "x" if capture else ""
+        else:
+            san = FEN_PIECES[piece_type].upper()
+            # disambiguate by file, then by rank, then by both, against same-type pieces reaching the same square
+            rivals = [other.from_sq for other in position.legal_moves()
+                      if other.to_sq == move.to_sq and other.from_sq != move.from_sq and
+                      board[other.from_sq] == board[move.from_sq]]
+            if rivals:
+                if all(rival % 8 != move.from_sq % 8 for rival in rivals):
+                    san += square_name(move.from_sq)[0]
+                elif all(rival // 8 != move.from_sq // 8 for rival in rivals):
+                    san += square_name(move.from_sq)[1]
+                else:
+                    san += square_name(move.from_sq)
+            if capture:
+                san += "x"
+        san += square_name(move.to_sq)
+        if move.promotion is not None:
+            san += "=" + FEN_PIECES[move.promotion].upper()
+
+    position.push(move)
+    if position.is_check():
+        san += "#" if not position.legal_moves() else "+"
+    position.pop()
+    return san
+
+
+def parse_san(position, san):
+    text = san.rstrip("+#!?").replace("0", "O")
+    moves = position.legal_moves()
+    board = position.board
+    if text in ("O-O", "O-O-O"):
+        for move in moves:
+            if board[move.from_sq] % 6 == KING and move.to_sq - move.from_sq == (2 if text == "O-O" else -2):
+                return move
+        raise ValueError(f"illegal move {san!r} in {position.fen()}")
+
+    match = _SAN.match(text)
+    if not match:
+        raise ValueError(f"invalid SAN {san!r}")
+    piece, from_file, from_rank, to_square, promotion = match.groups()
+    piece_type = FEN_PIECES.index(piece.lower()) if piece else PAWN
+    to_sq = parse_square(to_square)
+    promotion = FEN_PIECES.index(promotion.lower()) if promotion else None
+
+    candidates = [move for move in moves
+                  if move.to_sq == to_sq and board[move.from_sq] % 6 == piece_type and move.promotion == promotion and
+                  (from_file is None or "abcdefgh"[move.from_sq % 8] == from_file) and
+                  (from_rank is None or str(8 - move.from_sq // 8) == from_rank)]
+    if len(candidates) != 1:
+        problem = "illegal" if not candidates else "ambiguous"
+        raise ValueError(f"{problem} move {san!r} in {position.fen()}")
+    return candidates[0]
+
+
+def read_games(source):
+    # yields PgnGame for each game in a path or an iterable of lines, holding only one game in memory
+    if isinstance(source, str):
+        with open(source, encoding="utf-8", errors="replace") as lines:
+            yield from read_games(lines)
+        return
+
+    headers = {}
+    movetext = []
+    in_comment, variation_depth = False, 0
+    after_blank = False
+    for line in source:
+        stripped = line.strip()
+        if movetext and (in_comment or variation_depth) and not (after_blank and _HEADER.match(stripped)):
+            # a line opening with "[" inside a comment or variation, like a wrapped [%clk], is still movetext;
+            # only a header after a blank line gets out of one left unclosed
+            movetext.append(line)
+            in_comment, variation_depth = _nesting(line, in_comment, variation_depth)
+            after_blank = not stripped
+            continue
+        after_blank = not stripped
+        if stripped.startswith("[") and not movetext:
+            match = _HEADER.match(stripped)
+            if match:
+                headers[match.group(1)] = match.group(2).replace('\\"', '"')
+            continue
+        if stripped.startswith("[") and movetext:
+            # a header right after movetext starts the next game even without a blank line between them
+            yield _parse_movetext(headers, movetext)
+            headers, movetext = {}, []
+            in_comment, variation_depth = False, 0
+            match = _HEADER.match(stripped)
+            if match:
+                headers[match.group(1)] = match.group(2).replace('\\"', '"')
+            continue
+        if stripped.startswith("%"):
+            continue
+        if stripped:
+            movetext.append(line)
+            in_comment, variation_depth = _nesting(line, in_comment, variation_depth)
+    if headers or movetext:
+        yield _parse_movetext(headers, movetext)
+
+
+def _nesting(line, in_comment, variation_depth):
+    # whether a {...} comment is still open after line, and how many variations are, given the same at its start
+    for match in _NESTING.finditer(line):
+        char = match.group()
+        if in_comment:
+            in_comment = char != "}"
+        elif char == ";":
+            break
+        elif char == "{":
+            in_comment = True
+        elif char == "(":
+            variation_depth += 1
+        elif char == ")":
+            variation_depth = max(0, variation_depth - 1)
+    return in_comment, variation_depth
+
+
+def _parse_movetext(headers, lines):
+    moves = []
+    result = headers.get("Result", "*")
+    variation_depth = 0
+    for token in _TOKEN.findall("".join(lines)):
+        if token == "(":
+            variation_depth += 1
+        elif token == ")":
+            variation_depth = max(0, variation_depth - 1)
+        elif variation_depth or token[0] in "{;$" or token == "e.p." or _MOVE_NUMBER.match(token):
+            continue
+        elif token in RESULTS:
+            result = token
+        else:
+            # "12.e4" style, with no space after the move number
+            moves.append(token.split(".")[-1])
+    return PgnGame(headers, moves, result)
+
+
+def replay(game):
+    # plays a PgnGame through the rules engine; returns the final Position, raising ValueError on a bad move
+    position = Position(game.headers.get("FEN", STARTING_FEN))
+    for san in game.moves:
+        position.push(parse_san(position, san))
+    return position
+
+
+def write_game(moves, headers=None, start_fen=STARTING_FEN):
+    # PGN text for a list of Move played from start_fen
+    headers = dict(headers or {})
+    for tag in SEVEN_TAG_ROSTER:
+        headers.setdefault(tag, "*" if tag == "Result" else "?")
+    if start_fen != STARTING_FEN:
+        headers.setdefault("SetUp", "1")
+        headers.setdefault("FEN", start_fen)
+    tags = SEVEN_TAG_ROSTER + [tag for tag in headers if tag not in SEVEN_TAG_ROSTER]
+    lines = [f'[{tag} "{headers[tag]}"]' for tag in tags]
+    lines.append("")
+
+    position = Position(start_fen)
+    tokens = []
+    for i, move in enumerate(moves):
+        if position.turn == WHITE:
+            tokens.append(f"{position.fullmove_number}.")
+        elif i == 0:
+            tokens.append(f"{position.fullmove_number}...")
+        tokens.append(move_to_san(position, move))
+        position.push(move)
+    tokens.append(headers["Result"])
+
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n"
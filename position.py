@@ -0,0 +1,617 @@
+# Headless chess rules: no tkinter or PIL imports so this can run on display-less workers.
+import random
+from collections import namedtuple
+
+import stats
+
+WHITE, BLACK = 0, 1
+COLOR_NAMES = ["white", "black"]
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PIECE_TYPE_NAMES = ["pawn", "knight", "bishop", "rook", "queen", "king"]
+# piece code = color * 6 + piece type, e.g. PIECE_NAMES[BLACK * 6 + ROOK] == "black_rook"
+PIECE_NAMES = [f"{color}_{piece_type}" for color in COLOR_NAMES for piece_type in PIECE_TYPE_NAMES]
+PROMOTION_TYPES = [QUEEN, ROOK, BISHOP, KNIGHT]
+FEN_PIECES = "pnbrqk"
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+CASTLING_RIGHTS = [WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE]
+
+# squares are numbered row * 8 + col with row 0 being the 8th rank, same layout as the GUI board,
+# and bit n of a bitboard stands for square n
+Move = namedtuple("Move", ["from_sq", "to_sq", "promotion"], defaults=[None])
+
+ROW_MASKS = [0xFF << (8 * row) for row in range(8)]
+FULL = (1 << 64) - 1
+COL_MASKS = [0x0101010101010101 << col for col in range(8)]
+LIGHT_SQUARES = sum(1 << sq for sq in range(64) if (sq // 8 + sq % 8) % 2 == 0)
+
+# castling rights that survive a move touching the given square
+CASTLING_MASK = [15] * 64
+CASTLING_MASK[0] = 15 & ~BLACK_QUEENSIDE
+CASTLING_MASK[4] = 15 & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASK[7] = 15 & ~BLACK_KINGSIDE
+CASTLING_MASK[56] = 15 & ~WHITE_QUEENSIDE
+CASTLING_MASK[60] = 15 & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASK[63] = 15 & ~WHITE_KINGSIDE
+# (right, king square, rook square, color): where the pieces a castling right needs start out
+_CASTLING_HOMES = [(WHITE_KINGSIDE, 60, 63, WHITE), (WHITE_QUEENSIDE, 60, 56, WHITE),
+                   (BLACK_KINGSIDE, 4, 7, BLACK), (BLACK_QUEENSIDE, 4, 0, BLACK)]
+
+
+def square(row, col):
+    return row * 8 + col
+
+
+def square_name(sq):
+    return "abcdefgh"[sq % 8] + str(8 - sq // 8)
+
+
+def parse_square(name):
+    if len(name) != 2 or name[0] not in "abcdefgh" or name[1] not in "12345678":
+        raise ValueError(f"invalid square: {name!r}")
+    return square(8 - int(name[1]), "abcdefgh".index(name[0]))
+
+
+def move_to_uci(move):
+    text = square_name(move.from_sq) + square_name(move.to_sq)
+    return text if move.promotion is None else text + FEN_PIECES[move.promotion]
+
+
+def move_from_uci(text):
+    promotion = FEN_PIECES.index(text[4]) if len(text) > 4 else None
+    return Move(parse_square(text[:2]), parse_square(text[2:4]), promotion)
+
+
+def _step_attacks(sq, steps):
+    row, col = divmod(sq, 8)
+    attacks = 0
+    for i, j in steps:
+        if 0 <= row + i < 8 and 0 <= col + j < 8:
+            attacks |= 1 << square(row + i, col + j)
+    return attacks
+
+
+def _ray(sq, i, j, occupied=0):
+    # squares seen from sq in direction (i, j), up to and including the first occupied one
+    row, col = divmod(sq, 8)
+    ray = 0
+    row, col = row + i, col + j
+    while 0 <= row < 8 and 0 <= col < 8:
+        ray |= 1 << square(row, col)
+        if occupied >> square(row, col) & 1:
+            break
+        row, col = row + i, col + j
+    return ray
+
+
+def _line_table(sq, i, j):
+    # attacks along one line through sq for every arrangement of blockers on it; the last square of each
+    # ray is always attacked whether or not it is occupied, so only the inner squares are relevant
+    relevant = 0
+    for di, dj in ((i, j), (-i, -j)):
+        ray = _ray(sq, di, dj)
+        if ray:
+            edge = 1 << (ray.bit_length() - 1) if di * 8 + dj > 0 else ray & -ray
+            relevant |= ray & ~edge
+    table = {}
+    subset = 0
+    while True:
+        table[subset] = _ray(sq, i, j, subset) | _ray(sq, -i, -j, subset)
+        subset = (subset - relevant) & relevant
+        if not subset:
+            break
+    return relevant, table
+
+
+def _lines(a, b):
+    # (squares strictly between a and b, the whole line through both) if they share a rank, file or diagonal
+    (row_a, col_a), (row_b, col_b) = divmod(a, 8), divmod(b, 8)
+    if a == b or not (row_a == row_b or col_a == col_b or abs(row_a - row_b) == abs(col_a - col_b)):
+        return 0, 0
+    i, j = (row_b > row_a) - (row_b < row_a), (col_b > col_a) - (col_b < col_a)
+    return _ray(a, i, j, 1 << b) & ~(1 << b), _ray(a, i, j) | _ray(a, -i, -j) | 1 << a
+
+
+KNIGHT_ATTACKS = [_step_attacks(sq, [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)])
+                  for sq in range(64)]
+KING_ATTACKS = [_step_attacks(sq, [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+                for sq in range(64)]
+# squares a pawn of the given color on sq attacks; white pawns move towards row 0
+PAWN_ATTACKS = [[_step_attacks(sq, [(-1, -1), (-1, 1)]) for sq in range(64)],
+                [_step_attacks(sq, [(1, -1), (1, 1)]) for sq in range(64)]]
+
+BETWEEN = [[_lines(a, b)[0] for b in range(64)] for a in range(64)]
+LINE = [[_lines(a, b)[1] for b in range(64)] for a in range(64)]
+
+# per square: (relevant blocker mask, {blockers on the line: attacked squares}) for the rank, file and diagonals
+_RANK_TABLES = [_line_table(sq, 0, 1) for sq in range(64)]
+_FILE_TABLES = [_line_table(sq, 1, 0) for sq in range(64)]
+_DIAGONAL_TABLES = [_line_table(sq, 1, 1) for sq in range(64)]
+_ANTI_DIAGONAL_TABLES = [_line_table(sq, 1, -1) for sq in range(64)]
+
+
+# Zobrist keys, from a fixed seed so position keys are stable across processes and runs
+_zobrist_random = random.Random(20240601)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in range(12)]
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_EP_FILES = [_zobrist_random.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+
+
+def rook_attacks(sq, occupied):
+    rank_mask, rank_table = _RANK_TABLES[sq]
+    file_mask, file_table = _FILE_TABLES[sq]
+    return rank_table[occupied & rank_mask] | file_table[occupied & file_mask]
+
+
+def bishop_attacks(sq, occupied):
+    diagonal_mask, diagonal_table = _DIAGONAL_TABLES[sq]
+    anti_mask, anti_table = _ANTI_DIAGONAL_TABLES[sq]
+    return diagonal_table[occupied & diagonal_mask] | anti_table[occupied & anti_mask]
+
+
+def queen_attacks(sq, occupied):
+    return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+
+
+class Position:
+    def __init__(self, fen=STARTING_FEN):
+        self.set_fen(fen)
+
+    def set_fen(self, fen):
+        fields = fen.split()
+        rows = fields[0].split("/") if fields else []
+        if len(fields) < 4 or len(rows) != 8:
+            raise ValueError(f"invalid FEN: {fen!r}")
+
+        board = [None] * 64
+        for row, text in enumerate(rows):
+            col = 0
+            for char in text:
+                if char.isdigit():
+                    col += int(char)
+                elif char.lower() in FEN_PIECES and col < 8:
+                    board[square(row, col)] = (WHITE if char.isupper() else BLACK) * 6 + FEN_PIECES.index(char.lower())
+                    col += 1
+                else:
+                    raise ValueError(f"invalid FEN: {fen!r}")
+            if col != 8:
+                raise ValueError(f"invalid FEN: {fen!r}")
+
+        castling = 0
+        for char, right in zip("KQkq", CASTLING_RIGHTS):
+            if char in fields[2]:
+                castling |= right
+        if fields[1] not in ("w", "b"):
+            raise ValueError(f"invalid FEN, side to move must be w or b: {fen!r}")
+        try:
+            self.set_board(board, WHITE if fields[1] == "w" else BLACK, castling,
+                           None if fields[3] == "-" else parse_square(fields[3]),
+                           int(fields[4]) if len(fields) > 4 else 0, int(fields[5]) if len(fields) > 5 else 1)
+        except ValueError as error:
+            raise ValueError(f"invalid FEN, {error}: {fen!r}") from None
+
+    def set_board(self, board, turn, castling, ep_square, halfmove_clock, fullmove_number):
+        # sets up from a piece code (or None) per square and the remaining state, starting a new game
+        self.pieces = [0] * 12  # one bitboard per piece code
+        self.occupied = [0, 0]  # one bitboard per color
+        self.board = [None] * 64  # piece code per square, for cheap lookups of what sits where
+        for sq, piece in enumerate(board):
+            if piece is not None:
+                self._put(piece, sq)
+        if self.pieces[WHITE * 6 + KING].bit_count() != 1 or self.pieces[BLACK * 6 + KING].bit_count() != 1:
+            raise ValueError("each side needs exactly one king")
+        if (self.pieces[WHITE * 6 + PAWN] | self.pieces[BLACK * 6 + PAWN]) & (ROW_MASKS[0] | ROW_MASKS[7]):
+            raise ValueError("pawns can't stand on the first or last rank")
+
+        # rights whose king or rook has left its home square, and an en passant square no pawn just
+        # skipped over, are dropped rather than trusted, as moves generated from them couldn't be played
+        for right, king_sq, rook_sq, color in _CASTLING_HOMES:
+            if self.board[king_sq] != color * 6 + KING or self.board[rook_sq] != color * 6 + ROOK:
+                castling &= ~right
+        if ep_square is not None:
+            pushed = ep_square + 8 if turn == WHITE else ep_square - 8
+            if ep_square // 8 != (2 if turn == WHITE else 5) or self.board[pushed] != (1 - turn) * 6 + PAWN or \
+               self.board[ep_square] is not None or self.board[2 * ep_square - pushed] is not None:
+                ep_square = None
+
+        self.turn = turn
+        self.castling = castling
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        self.fullmove_number = fullmove_number
+        self.move_stack = []
+        self._undo = []
+        self.key = self.compute_key()
+        # how often each position key has occurred in this game, for repetition draws
+        self.repetitions = {self.key: 1}
+
+    def fen(self):
+        rows = []
+        for row in range(8):
+            text = ""
+            empty = 0
+            for col in range(8):
+                piece = self.board[square(row, col)]
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                char = FEN_PIECES[piece % 6]
+                text += char.upper() if piece < 6 else char
+            rows.append(text + (str(empty) if empty else ""))
+        castling = "".join(char for char, right in zip("KQkq", CASTLING_RIGHTS) if self.castling & right) or "-"
+        ep_square = "-" if self.ep_square is None else square_name(self.ep_square)
+        return f"{'/'.join(rows)} {'wb'[self.turn]} {castling} {ep_square} {self.halfmove_clock} {self.fullmove_number}"
+
+    def copy(self):
+        position = Position.__new__(Position)
+        position.__dict__.update(self.__dict__)
+        for name in ("pieces", "occupied", "board", "move_stack", "_undo", "repetitions"):
+            setattr(position, name, getattr(self, name).copy())
+        return position
+
+    def compute_key(self):
+        # from scratch; push keeps self.key up to date incrementally
+        key = ZOBRIST_CASTLING[self.castling]
+        for sq, piece in enumerate(self.board):
+            if piece is not None:
+                key ^= ZOBRIST_PIECES[piece][sq]
+        if self._ep_capturable():
+            key ^= ZOBRIST_EP_FILES[self.ep_square % 8]
+        if self.turn == BLACK:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        return key
+
+    def _ep_capturable(self):
+        # the en passant square only counts towards the key if a pawn can actually capture there
+        return self.ep_square is not None and \
+            PAWN_ATTACKS[1 - self.turn][self.ep_square] & self.pieces[self.turn * 6 + PAWN] != 0
+
+    def _put(self, piece, sq):
+        self.pieces[piece] |= 1 << sq
+        self.occupied[piece // 6] |= 1 << sq
+        self.board[sq] = piece
+
+    def _remove(self, sq):
+        piece = self.board[sq]
+        self.pieces[piece] &= ~(1 << sq)
+        self.occupied[piece // 6] &= ~(1 << sq)
+        self.board[sq] = None
+        return piece
+
+    def piece_at(self, sq):
+        return self.board[sq]
+
+    def color_at(self, sq):
+        piece = self.board[sq]
+        return None if piece is None else piece // 6
+
+    def king_square(self, color):
+        return self.pieces[color * 6 + KING].bit_length() - 1
+
+    def attackers(self, sq, by_color, occupied=None):
+        if occupied is None:
+            occupied = self.occupied[WHITE] | self.occupied[BLACK]
+        pieces = self.pieces
+        base = by_color * 6
+        queens = pieces[base + QUEEN]
+        return (PAWN_ATTACKS[1 - by_color][sq] & pieces[base + PAWN]) | \
+               (KNIGHT_ATTACKS[sq] & pieces[base + KNIGHT]) | \
+               (KING_ATTACKS[sq] & pieces[base + KING]) | \
+               (bishop_attacks(sq, occupied) & (pieces[base + BISHOP] | queens)) | \
+               (rook_attacks(sq, occupied) & (pieces[base + ROOK] | queens))
+
+    def is_attacked(self, sq, by_color):
+        return self.attackers(sq, by_color) != 0
+
+    def is_check(self):
+        return self.is_attacked(self.king_square(self.turn), 1 - self.turn)
+
+    def attacked_squares(self, color, occupied):
+        # every square the given color attacks, with sliders looking through to the given occupancy
+        pieces = self.pieces
+        base = color * 6
+        pawns = pieces[base + PAWN]
+        if color == WHITE:
+            attacked = ((pawns >> 9) & ~COL_MASKS[7]) | ((pawns >> 7) & ~COL_MASKS[0])
+        else:
+            attacked = ((pawns << 7) & ~COL_MASKS[7] & FULL) | ((pawns << 9) & ~COL_MASKS[0] & FULL)
+        for piece_type, table in ((KNIGHT, KNIGHT_ATTACKS), (KING, KING_ATTACKS)):
+            bb = pieces[base + piece_type]
+            while bb:
+                attacked |= table[(bb & -bb).bit_length() - 1]
+                bb &= bb - 1
+        for sliders, attacks in ((pieces[base + BISHOP] | pieces[base + QUEEN], bishop_attacks),
+                                 (pieces[base + ROOK] | pieces[base + QUEEN], rook_attacks)):
+            while sliders:
+                attacked |= attacks((sliders & -sliders).bit_length() - 1, occupied)
+                sliders &= sliders - 1
+        return attacked
+
+    def pinned(self, color):
+        # bitboard of color's pieces that are the only blocker between their king and an enemy slider
+        pieces = self.pieces
+        base = (1 - color) * 6
+        king_sq = self.king_square(color)
+        occupied = self.occupied[WHITE] | self.occupied[BLACK]
+        snipers = (rook_attacks(king_sq, 0) & (pieces[base + ROOK] | pieces[base + QUEEN])) | \
+                  (bishop_attacks(king_sq, 0) & (pieces[base + BISHOP] | pieces[base + QUEEN]))
+        pinned = 0
+        while snipers:
+            blockers = BETWEEN[king_sq][(snipers & -snipers).bit_length() - 1] & occupied
+            snipers &= snipers - 1
+            if blockers and not blockers & (blockers - 1):
+                pinned |= blockers & self.occupied[color]
+        return pinned
+
+    def legal_moves(self):
+        # attacked squares, checkers and pins are computed once, then each piece's targets are masked with them
+        moves = []
+        append = moves.append
+        us = self.turn
+        them = 1 - us
+        pieces = self.pieces
+        own = self.occupied[us]
+        occupied = own | self.occupied[them]
+        base = us * 6
+        king_sq = self.king_square(us)
+
+        # the king must not hide behind itself from a slider, so look through it
+        attacked = self.attacked_squares(them, occupied ^ (1 << king_sq))
+        targets = KING_ATTACKS[king_sq] & ~own & ~attacked
+        while targets:
+            to_sq = (targets & -targets).bit_length() - 1
+            targets &= targets - 1
+            append(Move(king_sq, to_sq))
+
+        checkers = self.attackers(king_sq, them, occupied)
+        if checkers & (checkers - 1):
+            return moves  # double check: only the king can move
+        if checkers:
+            # a single check can only be answered by capturing the checker or blocking its line
+            check_mask = checkers | BETWEEN[king_sq][checkers.bit_length() - 1]
+        else:
+            check_mask = FULL
+            self._castling_moves(king_sq, occupied, attacked, moves)
+
+        pinned = self.pinned(us)
+        line = LINE[king_sq]
+        self._pawn_moves(occupied, check_mask, pinned, line, moves)
+
+        for piece_type, attacks in ((KNIGHT, None), (BISHOP, bishop_attacks), (ROOK, rook_attacks),
+                                    (QUEEN, queen_attacks)):
+            bb = pieces[base + piece_type]
+            while bb:
+                from_sq = (bb & -bb).bit_length() - 1
+                bb &= bb - 1
+                if piece_type == KNIGHT:
+                    targets = KNIGHT_ATTACKS[from_sq] & ~own & check_mask
+                else:
+                    targets = attacks(from_sq, occupied) & ~own & check_mask
+                if 1 << from_sq & pinned:
+                    targets &= line[from_sq]
+                while targets:
+                    to_sq = (targets & -targets).bit_length() - 1
+                    targets &= targets - 1
+                    append(Move(from_sq, to_sq))
+        return moves
+
+    def _pawn_moves(self, occupied, check_mask, pinned, line, moves):
+        append = moves.append
+        us = self.turn
+        enemy = self.occupied[1 - us]
+        if us == WHITE:
+            forward, start_row, last_row = -8, ROW_MASKS[6], ROW_MASKS[0]
+        else:
+            forward, start_row, last_row = 8, ROW_MASKS[1], ROW_MASKS[7]
+        pawn_attacks = PAWN_ATTACKS[us]
+        ep_square = self.ep_square
+
+        bb = self.pieces[us * 6 + PAWN]
+        while bb:
+            from_sq = (bb & -bb).bit_length() - 1
+            from_bit = bb & -bb
+            bb &= bb - 1
+
+            targets = pawn_attacks[from_sq] & enemy
+            push_sq = from_sq + forward
+            if not occupied >> push_sq & 1:
+                targets |= 1 << push_sq
+                if from_bit & start_row and not occupied >> (push_sq + forward) & 1:
+                    targets |= 1 << (push_sq + forward)
+            targets &= check_mask
+            if from_bit & pinned:
+                targets &= line[from_sq]
+
+            while targets:
+                to_sq = (targets & -targets).bit_length() - 1
+                targets &= targets - 1
+                if 1 << to_sq & last_row:
+                    for promotion in PROMOTION_TYPES:
+                        append(Move(from_sq, to_sq, promotion))
+                else:
+                    append(Move(from_sq, to_sq))
+
+            if ep_square is not None and pawn_attacks[from_sq] >> ep_square & 1:
+                # en passant removes two pawns from a rank at once, which the pin and check masks can't
+                # describe, so it is simply tried on the board
+                move = Move(from_sq, ep_square)
+                self.push(move)
+                if not self.attackers(self.king_square(us), 1 - us):
+                    append(move)
+                self.pop()
+
+    def _castling_moves(self, king_sq, occupied, attacked, moves):
+        kingside, queenside = (WHITE_KINGSIDE, WHITE_QUEENSIDE) if self.turn == WHITE else (BLACK_KINGSIDE, BLACK_QUEENSIDE)
+        if self.castling & kingside and not occupied & (0b11 << (king_sq + 1)) and \
+           not attacked & (0b11 << (king_sq + 1)):
+            moves.append(Move(king_sq, king_sq + 2))
+        if self.castling & queenside and not occupied & (0b111 << (king_sq - 3)) and \
+           not attacked & (0b11 << (king_sq - 2)):
+            moves.append(Move(king_sq, king_sq - 2))
+
+    def is_legal(self, move):
+        return move in self.legal_moves()
+
+    def _move_piece(self, from_sq, to_sq):
+        piece = self.board[from_sq]
+        bits = 1 << from_sq | 1 << to_sq
+        self.pieces[piece] ^= bits
+        self.occupied[piece // 6] ^= bits
+        self.board[from_sq], self.board[to_sq] = None, piece
+
+    def push(self, move):
+        # only what the move itself cannot tell us is kept for pop
+        board = self.board
+        pieces = self.pieces
+        from_sq, to_sq, promotion = move
+        us = self.turn
+        piece = board[from_sq]
+        piece_type = piece % 6
+        captured = board[to_sq]
+        ep_square = self.ep_square
+        self._undo.append((captured, self.castling, ep_square, self.halfmove_clock, self.key))
+        self.move_stack.append(move)
+
+        placed = piece if promotion is None else us * 6 + promotion
+        key = self.key ^ ZOBRIST_BLACK_TO_MOVE ^ ZOBRIST_PIECES[piece][from_sq] ^ ZOBRIST_PIECES[placed][to_sq]
+        if ep_square is not None and self._ep_capturable():
+            key ^= ZOBRIST_EP_FILES[ep_square % 8]
+
+        occupied = self.occupied
+        to_bit = 1 << to_sq
+        if captured is not None:
+            pieces[captured] ^= to_bit
+            occupied[1 - us] ^= to_bit
+            key ^= ZOBRIST_PIECES[captured][to_sq]
+        pieces[piece] ^= 1 << from_sq
+        pieces[placed] ^= to_bit
+        occupied[us] ^= 1 << from_sq | to_bit
+        board[from_sq] = None
+        board[to_sq] = placed
+
+        if piece_type == PAWN:
+            if to_sq == ep_square:
+                # en passant: the captured pawn sits beside the moving pawn, not on the target square
+                captured_sq = (from_sq & ~7) | (to_sq & 7)
+                key ^= ZOBRIST_PIECES[self._remove(captured_sq)][captured_sq]
+            self.ep_square = (from_sq + to_sq) // 2 if abs(to_sq - from_sq) == 16 else None
+            self.halfmove_clock = 0
+        else:
+            if piece_type == KING and abs(to_sq - from_sq) == 2:
+                rook_from, rook_to = (from_sq + 3, from_sq + 1) if to_sq > from_sq else (from_sq - 4, from_sq - 1)
+                rook_keys = ZOBRIST_PIECES[us * 6 + ROOK]
+                key ^= rook_keys[rook_from] ^ rook_keys[rook_to]
+                self._move_piece(rook_from, rook_to)
+            self.ep_square = None
+            self.halfmove_clock = 0 if captured is not None else self.halfmove_clock + 1
+
+        castling = self.castling & CASTLING_MASK[from_sq] & CASTLING_MASK[to_sq]
+        if castling != self.castling:
+            key ^= ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_CASTLING[castling]
+            self.castling = castling
+        if us == BLACK:
+            self.fullmove_number += 1
+        self.turn = 1 - us
+        if self.ep_square is not None and self._ep_capturable():
+            key ^= ZOBRIST_EP_FILES[self.ep_square % 8]
+        self.key = key
+        self.repetitions[key] = self.repetitions.get(key, 0) + 1
+
+    def pop(self):
+        from_sq, to_sq, promotion = move = self.move_stack.pop()
+        count = self.repetitions[self.key]
+        if count == 1:
+            del self.repetitions[self.key]
+        else:
+            self.repetitions[self.key] = count - 1
+        captured, self.castling, ep_square, self.halfmove_clock, self.key = self._undo.pop()
+        self.ep_square = ep_square
+        self.turn = us = 1 - self.turn
+        if us == BLACK:
+            self.fullmove_number -= 1
+
+        board = self.board
+        pieces = self.pieces
+        occupied = self.occupied
+        to_bit = 1 << to_sq
+        placed = board[to_sq]
+        piece = placed if promotion is None else us * 6 + PAWN
+        pieces[placed] ^= to_bit
+        pieces[piece] ^= 1 << from_sq
+        occupied[us] ^= 1 << from_sq | to_bit
+        board[from_sq] = piece
+        board[to_sq] = captured
+        if captured is not None:
+            pieces[captured] ^= to_bit
+            occupied[1 - us] ^= to_bit
+
+        piece_type = piece % 6
+        if piece_type == PAWN and to_sq == ep_square:
+            self._put((1 - us) * 6 + PAWN, (from_sq & ~7) | (to_sq & 7))
+        elif piece_type == KING and abs(to_sq - from_sq) == 2:
+            if to_sq > from_sq:
+                self._move_piece(from_sq + 1, from_sq + 3)
+            else:
+                self._move_piece(from_sq - 1, from_sq - 4)
+        return move
+
+    def is_checkmate(self):
+        return self.is_check() and not self.legal_moves()
+
+    def is_stalemate(self):
+        return not self.is_check() and not self.legal_moves()
+
+    def repetition_count(self):
+        # occurrences of the current position so far, this one included
+        return self.repetitions[self.key]
+
+    def is_threefold_repetition(self):
+        return self.repetitions[self.key] >= 3
+
+    def is_fivefold_repetition(self):
+        return self.repetitions[self.key] >= 5
+
+    def is_fifty_moves(self):
+        return self.halfmove_clock >= 100
+
+    def is_seventyfive_moves(self):
+        return self.halfmove_clock >= 150
+
+    def is_insufficient_material(self):
+        # neither side can mate: bare kings plus at most one minor piece, or only bishops all on one square color
+        pieces = self.pieces
+        for color in (WHITE, BLACK):
+            if pieces[color * 6 + PAWN] or pieces[color * 6 + ROOK] or pieces[color * 6 + QUEEN]:
+                return False
+        knights = pieces[KNIGHT] | pieces[6 + KNIGHT]
+        bishops = pieces[BISHOP] | pieces[6 + BISHOP]
+        if not bishops:
+            return knights & (knights - 1) == 0
+        return not knights and (bishops & LIGHT_SQUARES == 0 or bishops & ~LIGHT_SQUARES == 0)
+
+    def outcome(self, claim_draw=False):
+        # (result, termination) once the game is over, else None; threefold repetition and the
+        # fifty-move rule only end the game when claim_draw is set, as a player has to claim them
+        if not self.legal_moves():
+            if self.is_check():
+                return ("0-1" if self.turn == WHITE else "1-0"), "checkmate"
+            return "1/2-1/2", "stalemate"
+        if self.is_insufficient_material():
+            return "1/2-1/2", "insufficient material"
+        if self.halfmove_clock >= 150 or claim_draw and self.halfmove_clock >= 100:
+            return "1/2-1/2", "seventy-five-move rule" if self.halfmove_clock >= 150 else "fifty-move rule"
+        count = self.repetitions[self.key]
+        if count >= 5 or claim_draw and count >= 3:
+            return "1/2-1/2", "fivefold repetition" if count >= 5 else "threefold repetition"
+        return None
+
+
+stats.watch(Position, "legal_moves")
+stats.watch(Position, "is_legal")
+stats.watch(Position, "outcome")
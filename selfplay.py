@@ -0,0 +1,123 @@
+# Headless engine-vs-engine matches spread over a process pool, for measuring strength and speed between releases.
+import json
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import Engine
+from packed import pack_moves, unpack_moves
+from parallel import default_workers
+from pgn import write_game
+from position import Position, move_to_uci
+
+MAX_PLIES = 400  # games still running after this many plies are adjudicated as draws
+OPENING_PLIES = 8  # random plies each game pair starts with, as engine players alone would repeat their games
+
+_engines = {}
+
+
+def parse_player(spec):
+    # "random", "depth:N" or "movetime:MS" -> (kind, value)
+    kind, _, value = spec.partition(":")
+    if kind == "random" and not value:
+        return ("random", None)
+    if kind in ("depth", "movetime") and value.isdigit() and int(value) > 0:
+        return (kind, int(value))
+    raise ValueError(f"invalid player {spec!r}, expected random, depth:N or movetime:MS")
+
+
+def _choose_move(player, position, rng):
+    kind, value = player
+    if kind == "random":
+        return rng.choice(position.legal_moves())
+    # one engine per player and process, so transposition tables carry over between games
+    engine = _engines.get(player)
+    if engine is None:
+        engine = _engines[player] = Engine(depth=value if kind == "depth" else None,
+                                           movetime=value if kind == "movetime" else None)
+    return engine.search(position)
+
+
+def play_game(white, black, seed, max_plies=MAX_PLIES, opening_plies=OPENING_PLIES):
+    # plays one game between two parsed players, starting with opening_plies random moves drawn from seed;
+    # returns a result dict, its moves packed in an array('H')
+    rng = random.Random(seed)
+    position = Position()
+    players = (white, black)
+    moves = []
+    start = time.perf_counter()
+    while True:
+        outcome = position.outcome(claim_draw=True)
+        if outcome is not None:
+            result, termination = outcome
+            break
+        if len(moves) >= max_plies:
+            result, termination = "1/2-1/2", "ply limit"
+            break
+        if len(moves) < opening_plies:
+            move = rng.choice(position.legal_moves())
+        else:
+            move = _choose_move(players[position.turn], position, rng)
+        position.push(move)
+        moves.append(move)
+    return {"white": white, "black": black, "seed": seed, "result": result, "termination": termination,
+            "plies": len(moves), "seconds": time.perf_counter() - start, "moves": pack_moves(moves)}
+
+
+def _play_task(args):
+    return play_game(*args)
+
+
+def run_match(player1, player2, games, workers=None, seed=0, max_plies=MAX_PLIES, opening_plies=OPENING_PLIES):
+    # yields finished games in order; games go in pairs playing the same opening with colors swapped,
+    # player1 taking white in even-numbered games
+    tasks = [((player1, player2) if i % 2 == 0 else (player2, player1)) + (seed + i // 2, max_plies, opening_plies)
+             for i in range(games)]
+    workers = workers or default_workers()
+    if workers == 1:
+        yield from map(_play_task, tasks)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        yield from pool.map(_play_task, tasks, chunksize=max(1, games // (workers * 8)))
+
+
+def format_player(player):
+    kind, value = player
+    return kind if value is None else f"{kind}:{value}"
+
+
+def game_record(game, output_format):
+    white, black = format_player(game["white"]), format_player(game["black"])
+    moves = unpack_moves(game["moves"])
+    if output_format == "pgn":
+        headers = {"Event": "selfplay", "Round": str(game["seed"]), "White": white, "Black": black,
+                   "Result": game["result"], "Termination": game["termination"]}
+        return write_game(moves, headers) + "\n"
+    return json.dumps({"white": white, "black": black, "seed": game["seed"], "result": game["result"],
+                       "termination": game["termination"], "plies": game["plies"],
+                       "moves": [move_to_uci(move) for move in moves]}) + "\n"
+
+
+def summarize(games):
+    # win/draw/loss from player1's side, its score with a 95% interval, and the matching Elo difference;
+    # every game needs its result and whether player1 had white
+    wins = draws = losses = 0
+    for game in games:
+        if game["result"] == "1/2-1/2":
+            draws += 1
+        elif (game["result"] == "1-0") == game["player1_white"]:
+            wins += 1
+        else:
+            losses += 1
+    total = wins + draws + losses
+    score = (wins + draws / 2) / total if total else 0.0
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / total if total else 0.0
+    margin = 1.96 * math.sqrt(variance / total) if total else 0.0
+    return {"wins": wins, "draws": draws, "losses": losses, "score": score, "margin": margin,
+            "elo": _elo(score), "elo_low": _elo(score - margin), "elo_high": _elo(score + margin)}
+
+
+def _elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1) + 0.0  # + 0.0 turns -0.0 into 0.0
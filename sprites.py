@@ -0,0 +1,69 @@
+# Piece images, loaded on first use and kept per (piece, size). Rendered sizes are also written to an
+# on-disk cache as small PNGs that Tk can read by itself, so a warm start never touches PIL.
+import os
+import tkinter as tk
+
+default_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "chess_game", "sprites")
+sheet_path = "./Images/pngfind.com-chess-pieces-png-6922125.png"
+# the sheet has white pieces on the top row and black below, each row ordered like this
+sheet_columns = ["king", "queen", "bishop", "knight", "rook", "pawn"]
+
+
+class SpriteAtlas:
+    def __init__(self, image_paths=None, sheet=None, cache_dir=default_cache_dir):
+        # pieces come from one file each in image_paths, or are cut out of the single sprite sheet
+        self.image_paths = image_paths or {}
+        self.sheet = sheet
+        self.cache_dir = cache_dir
+        self.photos = {}
+        self._sheet_image = None
+
+    def get(self, piece, size):
+        # PhotoImage for piece at size x size, or "" for an empty square
+        if piece is None:
+            return ""
+        photo = self.photos.get((piece, size))
+        if photo is None:
+            photo = self.photos[(piece, size)] = self._load(piece, size)
+        return photo
+
+    def _source(self, piece):
+        return self.sheet if self.sheet else self.image_paths[piece]
+
+    def _cache_path(self, piece, size):
+        source = os.path.splitext(os.path.basename(self._source(piece)))[0]
+        return os.path.join(self.cache_dir, f"{source}-{piece}-{size}.png")
+
+    def _load(self, piece, size):
+        cached = self._cache_path(piece, size) if self.cache_dir else None
+        if cached and os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(self._source(piece)):
+            return tk.PhotoImage(file=cached)
+
+        image = self._render(piece, size)
+        if cached:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                image.save(cached)
+            except OSError:
+                pass  # a read-only cache only costs the next start its speed
+        from PIL import ImageTk
+        return ImageTk.PhotoImage(image)
+
+    def _render(self, piece, size):
+        from PIL import Image
+        if not self.sheet:
+            return Image.open(self.image_paths[piece]).resize((size, size), Image.Resampling.BILINEAR)
+
+        if self._sheet_image is None:
+            self._sheet_image = Image.open(self.sheet).convert("RGBA")
+        width, height = self._sheet_image.size
+        color, piece_type = piece.split("_")
+        col, row = sheet_columns.index(piece_type), 0 if color == "white" else 1
+        cell = self._sheet_image.crop((col * width // 6, row * height // 2, (col + 1) * width // 6, (row + 1) * height // 2))
+        # cells are not quite square, so scale to fit and center on a transparent tile
+        scale = size / max(cell.size)
+        cell = cell.resize((max(1, round(cell.width * scale)), max(1, round(cell.height * scale))),
+                           Image.Resampling.BILINEAR)
+        tile = Image.new("RGBA", (size, size))
+        tile.paste(cell, ((size - cell.width) // 2, (size - cell.height) // 2))
+        return tile
@@ -0,0 +1,121 @@
+# Opt-in counters and timers for the hot paths. Watched methods are only wrapped once enable() is
+# called, so with stats off they run exactly as written. Timings keep exact call counts, totals and
+# maxima, plus a bounded random sample of latencies for percentiles.
+import functools
+import random
+import threading
+import time
+
+SAMPLE_SIZE = 10000
+
+enabled = False
+_watched = []
+_originals = {}
+_counters = {}
+_timers = {}
+_lock = threading.Lock()
+_random = random.Random(0)
+
+
+class Timer:
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+
+    def add(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        # reservoir sampling: every call so far has the same chance of being in the sample
+        if len(self.samples) < SAMPLE_SIZE:
+            self.samples.append(seconds)
+        else:
+            slot = _random.randrange(self.calls)
+            if slot < SAMPLE_SIZE:
+                self.samples[slot] = seconds
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def watch(owner, name, label=None):
+    # times calls to owner.name under label whenever stats are enabled
+    _watched.append((owner, name, label or f"{owner.__name__}.{name}"))
+    if enabled:
+        _wrap(owner, name, _watched[-1][2])
+
+
+def _wrap(owner, name, label):
+    original = _originals.setdefault((owner, name), getattr(owner, name))
+
+    @functools.wraps(original)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            record(label, time.perf_counter() - start)
+
+    setattr(owner, name, timed)
+
+
+def enable():
+    global enabled
+    if not enabled:
+        enabled = True
+        for owner, name, label in _watched:
+            _wrap(owner, name, label)
+
+
+def disable():
+    global enabled
+    enabled = False
+    for (owner, name), original in _originals.items():
+        setattr(owner, name, original)
+    _originals.clear()
+
+
+def count(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def record(name, seconds):
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None:
+            timer = _timers[name] = Timer()
+        timer.add(seconds)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+
+
+def report():
+    # {"counters": {name: count}, "timers": {name: {calls, total, mean, p50, p90, p99, max}}}, times in seconds
+    with _lock:
+        timers = {name: {"calls": timer.calls, "total": timer.total, "mean": timer.total / timer.calls,
+                         "p50": timer.percentile(0.5), "p90": timer.percentile(0.9), "p99": timer.percentile(0.99),
+                         "max": timer.max}
+                  for name, timer in _timers.items()}
+        return {"counters": dict(_counters), "timers": timers}
+
+
+def format_report():
+    stats = report()
+    lines = [f"{'timer':<28}{'calls':>10}{'total s':>10}{'mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}"
+             f"{'p99 ms':>10}{'max ms':>10}"]
+    for name, timer in sorted(stats["timers"].items(), key=lambda item: -item[1]["total"]):
+        lines.append(f"{name:<28}{timer['calls']:>10}{timer['total']:>10.3f}" +
+                     "".join(f"{timer[key] * 1000:>10.3f}" for key in ("mean", "p50", "p90", "p99", "max")))
+    for name, value in sorted(stats["counters"].items()):
+        lines.append(f"{name:<28}{value:>10}")
+    return "\n".join(lines)
@@ -0,0 +1,25 @@
+# Read-only access to the sorted record files behind the opening book, endgame tables and position
+# datasets: files are memory-mapped rather than read, and records are found by binary search on a
+# leading big-endian 64-bit key.
+import mmap
+import struct
+
+
+def open_mapped(path):
+    # read-only mapping of a whole file; an empty file maps to empty bytes, as mmap refuses length 0
+    with open(path, "rb") as file:
+        if not file.seek(0, 2):
+            return b""
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def lower_bound(data, record, key):
+    # index of the first record in data whose leading 64-bit key is >= key
+    low, high = 0, len(data) // record.size
+    while low < high:
+        middle = (low + high) // 2
+        if struct.unpack_from(">Q", data, middle * record.size)[0] < key:
+            low = middle + 1
+        else:
+            high = middle
+    return low
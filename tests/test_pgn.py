@@ -0,0 +1,22 @@
+from pgn import read_games
+
+
+def test_bracket_inside_wrapped_comment_stays_in_movetext():
+    lines = ['[Event "one"]\n', '[Result "1-0"]\n', '\n', '1. e4 {\n', '[%clk 0:03:00] } e5 2. Nf3 1-0\n',
+             '\n', '[Event "two"]\n', '\n', '1. d4 *\n']
+    games = list(read_games(lines))
+    assert [game.moves for game in games] == [["e4", "e5", "Nf3"], ["d4"]]
+    assert games[0].result == "1-0"
+    assert games[1].headers == {"Event": "two"}
+
+
+def test_bracket_inside_variation_stays_in_movetext():
+    lines = ['1. e4 (1. d4\n', '[%clk 0:03:00] d5) e5 *\n']
+    assert [game.moves for game in read_games(lines)] == [["e4", "e5"]]
+
+
+def test_header_after_unclosed_comment_and_blank_line_starts_next_game():
+    lines = ['1. e4 { never closed\n', '\n', '[Event "two"]\n', '1. d4 *\n']
+    games = list(read_games(lines))
+    assert len(games) == 2
+    assert games[1].moves == ["d4"]
@@ -0,0 +1,66 @@
+# Fixed-size transposition table: preallocated arrays, so memory use never grows after construction.
+from array import array
+
+from packed import pack_move, unpack_move
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+ENTRY_BYTES = 16  # one 64-bit key plus one 64-bit packed entry
+_SCORE_OFFSET = 1 << 19
+
+
+class TranspositionTable:
+    # every bucket holds two entries: the first is kept for the deepest search of the current
+    # generation, the second is always overwritten by whatever did not make it into the first
+    def __init__(self, size_mb=16):
+        self.buckets = max(1, size_mb * 1024 * 1024 // (2 * ENTRY_BYTES))
+        self.keys = array("Q", [0]) * (2 * self.buckets)
+        self.entries = array("Q", [0]) * (2 * self.buckets)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def new_search(self):
+        # entries from older searches lose their claim on the depth-preferred slot
+        self.generation = (self.generation + 1) & 0xFF
+
+    def clear(self):
+        self.keys = array("Q", [0]) * (2 * self.buckets)
+        self.entries = array("Q", [0]) * (2 * self.buckets)
+        self.hits = self.misses = self.stores = 0
+
+    def probe(self, key):
+        # (depth, score, bound, move) or None
+        index = key % self.buckets * 2
+        keys = self.keys
+        if keys[index] != key:
+            index += 1
+            if keys[index] != key:
+                self.misses += 1
+                return None
+        self.hits += 1
+        entry = self.entries[index]
+        return (entry >> 20 & 0xFF, (entry & 0xFFFFF) - _SCORE_OFFSET, entry >> 28 & 3, unpack_move(entry >> 38))
+
+    def store(self, key, depth, score, bound, move):
+        self.stores += 1
+        index = key % self.buckets * 2
+        entry = (score + _SCORE_OFFSET) | depth << 20 | bound << 28 | self.generation << 30 | pack_move(move) << 38
+        preferred = self.entries[index]
+        if self.keys[index] == key or depth >= (preferred >> 20 & 0xFF) or (preferred >> 30 & 0xFF) != self.generation:
+            self.keys[index] = key
+            self.entries[index] = entry
+        else:
+            self.keys[index + 1] = key
+            self.entries[index + 1] = entry
+
+    def hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def usage(self):
+        # share of slots written during the current generation, sampled from the first thousand buckets
+        sample = min(1000, self.buckets) * 2
+        return sum(1 for i in range(sample)
+                   if self.keys[i] and (self.entries[i] >> 30 & 0xFF) == self.generation) / sample
@@ -0,0 +1,161 @@
+# UCI protocol over stdin/stdout, so match harnesses and chess GUIs can drive the engine. One engine
+# lives for the whole session, keeping its transposition table between moves and games. Searches run
+# in a thread, which leaves the command loop free to answer isready and stop while one is going.
+import sys
+import threading
+
+from book import OpeningBook
+from endgames import EndgameTables
+from engine import MATE_BOUND, MATE_SCORE, Engine
+from position import STARTING_FEN, WHITE, Position, move_from_uci, move_to_uci
+from transposition import TranspositionTable
+
+ENGINE_NAME = "ChessGamePython"
+DEFAULT_MOVES_TO_GO = 30  # moves the remaining clock time is shared among when the GUI doesn't say
+
+
+class UciServer:
+    def __init__(self, engine=None, input=sys.stdin, output=sys.stdout):
+        self.engine = engine or Engine()
+        self.input = input
+        self.output = output
+        self.position = Position()
+        self.search_thread = None
+        self._stopped = threading.Event()  # lets an infinite search hold back its bestmove until stop
+        self._lock = threading.Lock()
+
+    def send(self, line):
+        with self._lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def run(self):
+        for line in self.input:
+            if not self.handle(line):
+                break
+        self.stop()
+
+    def handle(self, line):
+        # runs one command; False once the session should end
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send("option name Hash type spin default 16 min 0 max 4096")
+            self.send("option name BookFile type string default <empty>")
+            self.send("option name EndgamePath type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.stop()
+            self.set_option(arguments)
+        elif command == "ucinewgame":
+            self.stop()
+            if self.engine.tt is not None:
+                self.engine.tt.clear()
+            self.position = Position()
+        elif command == "position":
+            self.stop()
+            self.set_position(arguments)
+        elif command == "go":
+            self.stop()
+            self.go(arguments)
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            return False
+        # anything else, including ponderhit and debug, is ignored as the protocol asks
+        return True
+
+    def set_option(self, arguments):
+        # setoption name <name> [value <value>], where both may contain spaces
+        text = " ".join(arguments)
+        name, _, value = text.partition(" value ")
+        name = name.removeprefix("name ").strip().lower()
+        value = value.strip()
+        if name == "hash" and value.isdigit():
+            self.engine.tt = TranspositionTable(int(value)) if int(value) else None
+        elif name == "bookfile":
+            self.engine.book = OpeningBook(value) if value and value != "<empty>" else None
+        elif name == "endgamepath":
+            self.engine.endgames = EndgameTables(value) if value and value != "<empty>" else None
+
+    def set_position(self, arguments):
+        # position startpos|fen <fen> [moves <move> ...]; the moves are pushed so repetitions are known
+        moves = arguments.index("moves") if "moves" in arguments else len(arguments)
+        try:
+            if arguments[0] == "fen":
+                position = Position(" ".join(arguments[1:moves]))
+            else:
+                position = Position(STARTING_FEN)
+            for text in arguments[moves + 1:]:
+                move = move_from_uci(text)
+                if not position.is_legal(move):
+                    raise ValueError(f"illegal move {text}")
+                position.push(move)
+        except (IndexError, ValueError) as error:
+            self.send(f"info string invalid position: {error}")
+            return
+        self.position = position
+
+    def go(self, arguments):
+        options = {}
+        for i, token in enumerate(arguments):
+            if token in ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo") and \
+               i + 1 < len(arguments) and arguments[i + 1].lstrip("-").isdigit():
+                options[token] = int(arguments[i + 1])
+        infinite = "infinite" in arguments or "ponder" in arguments
+
+        movetime = options.get("movetime")
+        clock = options.get("wtime" if self.position.turn == WHITE else "btime")
+        if movetime is None and clock is not None and not infinite:
+            increment = options.get("winc" if self.position.turn == WHITE else "binc", 0)
+            # never plan on more than half the clock, and keep a little back for our own overhead
+            share = clock // options.get("movestogo", DEFAULT_MOVES_TO_GO) + increment
+            movetime = max(1, min(clock // 2, share) - 20)
+
+        position = self.position.copy()
+        self._stopped.clear()
+        self.engine.clear_stop()
+        self.search_thread = threading.Thread(target=self._search, args=(position, options.get("depth"), movetime,
+                                                                        infinite), daemon=True)
+        self.search_thread.start()
+
+    def _search(self, position, depth, movetime, infinite):
+        engine = self.engine
+
+        def report(iteration, score, move, seconds):
+            line = " ".join(move_to_uci(step) for step in engine.principal_variation(position, move))
+            self.send(f"info depth {iteration} score {format_score(score)} nodes {engine.nodes} "
+                      f"nps {int(engine.nodes / seconds) if seconds else 0} time {int(seconds * 1000)} pv {line}")
+
+        # a failed search still answers with bestmove, or the GUI would wait for one forever
+        try:
+            move = engine.search(position, depth=depth, movetime=movetime, on_iteration=report)
+        except Exception as error:
+            self.send(f"info string search failed: {error!r}")
+            move = None
+        if infinite:
+            self._stopped.wait()
+        self.send(f"bestmove {move_to_uci(move) if move is not None else '0000'}")
+
+    def stop(self):
+        # go clears the engine's stop before the thread starts, so one sent straight after still counts
+        thread = self.search_thread
+        if thread is None:
+            return
+        self._stopped.set()
+        self.engine.stop()
+        thread.join()
+        self.search_thread = None
+
+
+def format_score(score):
+    # "cp N", or "mate N" in moves, negative when the side to move is getting mated
+    if abs(score) < MATE_BOUND:
+        return f"cp {score}"
+    moves = (MATE_SCORE - abs(score) + 1) // 2
+    return f"mate {moves if score > 0 else -moves}"